@@ -0,0 +1,43 @@
+"""create collections registry
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00.000000
+
+Per-collection vector tables (collection_<id>) are created and dropped by
+the collections API at runtime; this revision manages the schema and the
+registry that maps collections to those tables.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(f'CREATE SCHEMA IF NOT EXISTS "{settings.CUSTOM_SCHEMA}"')
+    op.create_table(
+        'collections',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(length=255), nullable=False, unique=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        schema=settings.CUSTOM_SCHEMA,
+    )
+
+
+def downgrade() -> None:
+    # Drop the collections' vector tables along with the registry
+    bind = op.get_bind()
+    ids = bind.execute(sa.text(f'SELECT id FROM "{settings.CUSTOM_SCHEMA}".collections')).scalars().all()
+    for collection_id in ids:
+        op.execute(f'DROP TABLE IF EXISTS "{settings.CUSTOM_SCHEMA}"."collection_{collection_id}"')
+    op.drop_table('collections', schema=settings.CUSTOM_SCHEMA)
@@ -1,23 +1,14 @@
 # app/config.py
 
 import os
-import logging
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
+from app.tracing import configure_logging
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('app.log')
-    ]
-)
-
 class Settings(BaseSettings):
     # For starting postgres root password is needed
     # If supplied will be used to start postgres if not running
@@ -34,6 +25,25 @@ class Settings(BaseSettings):
     APP_NAME: str = "RAG API"
     APP_VERSION: str = "0.1.0"
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+
+    # Logging and tracing settings
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FILE: str = os.getenv("LOG_FILE", "app.log")  # empty to log to the console only
+    LOG_JSON: bool = os.getenv("LOG_JSON", "True").lower() == "true"
+    # Records buffered for the writer thread before new ones are dropped
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Fraction of requests that log a timed span per stage (X-Trace: 1 forces it)
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+    # Profiling settings
+    # Token the /admin/profile endpoints and X-Profile requests must present; empty disables them
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    # Per-request profiling at startup; switchable at runtime via /admin/profile/requests
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    # Oldest profile artifacts are deleted beyond this many
+    PROFILE_MAX_ARTIFACTS: int = int(os.getenv("PROFILE_MAX_ARTIFACTS", "50"))
     
     # Vector embedding settings
     EMBEDDING_MODEL: str = "all-mpnet-base-v2"
@@ -41,20 +51,125 @@ class Settings(BaseSettings):
     MODEL_CACHE_DIR: str = f"{CACHE_DIR}/models"
     EMBEDDING_CACHE_DIR: str = f"{CACHE_DIR}/embeddings"
     TFIDF_CACHE_PATH: str = f"{CACHE_DIR}/tfidf_retriever.pkl"
+    EXPANSION_TABLE_PATH: str = f"{CACHE_DIR}/expansion_table.json"
+    ROUTER_CENTROIDS_PATH: str = f"{CACHE_DIR}/router_centroids.json"
+    PROFILE_DIR: str = f"{CACHE_DIR}/profiles"
+    # Mean confidence the expansion terms need before an expanded search is run
+    EXPANSION_MIN_GAIN: float = float(os.getenv("EXPANSION_MIN_GAIN", "0.5"))
     
     CSV_VERSION:str = "1"
     USERGUIDE_SCHEMA: str = os.getenv("USERGUIDE_SCHEMA", "userguide")
     CUSTOM_SCHEMA: str = os.getenv("CUSTOM_SCHEMA", "custom_documents")
     USERGUIDE_TABLE:str = "USERGUIDE"+"_v"+CSV_VERSION
     VECTOR_SIZE:int= 768 # this is for all-mpnet-base-v2 model
+    EMBEDDING_MAX_TOKENS:int = 384 # all-mpnet-base-v2 truncates input beyond this
+    # Sections longer than this are split into overlapping chunks at conversion time
+    CHUNK_MAX_TOKENS:int = int(os.getenv("CHUNK_MAX_TOKENS", str(EMBEDDING_MAX_TOKENS - 2)))
+    CHUNK_OVERLAP_TOKENS:int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+    # Comma-separated markdown files, directories or globs the userguide (TF-IDF index and
+    # vector table) is built from at startup; empty means the prebuilt userguide CSV
+    USERGUIDE_SOURCES: str = os.getenv("USERGUIDE_SOURCES", "")
     OVERWRITE:bool = True    
 
+    # Near-duplicate detection at ingest (MinHash LSH)
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "True").lower() == "true"
+    DEDUP_THRESHOLD: float = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard similarity
+    DEDUP_NUM_PERM: int = 64
+    DEDUP_BANDS: int = 16
+    DEDUP_SHINGLE_SIZE: int = 3
+
+    # Connection pool settings, shared by SQLAlchemy and the vector store
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables
+    # Per-connection LRU of asyncpg prepared statements, 0 disables
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
     # API settings
     MAX_RESULTS: int = 10
+
+    # Hybrid fusion: "concat" lists TF-IDF hits before vector hits,
+    # "rrf" is weighted reciprocal rank fusion of the two legs
+    HYBRID_FUSION: str = os.getenv("HYBRID_FUSION", "concat")
+    HYBRID_TFIDF_WEIGHT: float = float(os.getenv("HYBRID_TFIDF_WEIGHT", "1.0"))
+    HYBRID_VECTOR_WEIGHT: float = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+
+    # Cross-encoder rerank settings
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_BUDGET_MS: float = float(os.getenv("RERANK_BUDGET_MS", "150"))
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+    # Candidates retrieved per requested result when reranking
+    RERANK_CANDIDATE_MULTIPLIER: int = int(os.getenv("RERANK_CANDIDATE_MULTIPLIER", "4"))
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+    # Load the cross-encoder in the app.serve parent so forked workers share its weights
+    RERANK_PRELOAD: bool = os.getenv("RERANK_PRELOAD", "True").lower() == "true"
+
+    # Query router settings
+    # Softmax temperature over centroid similarities
+    ROUTER_TEMPERATURE: float = float(os.getenv("ROUTER_TEMPERATURE", "0.05"))
+    # Routes within this much expected quality of the best compete on latency
+    ROUTER_QUALITY_TOLERANCE: float = float(os.getenv("ROUTER_QUALITY_TOLERANCE", "0.05"))
+    # Latency assumed per leg until real measurements arrive, and EWMA weight of new ones
+    ROUTER_LATENCY_PRIORS_MS: dict = {"tfidf": 5.0, "vector": 60.0}
+    ROUTER_LATENCY_ALPHA: float = float(os.getenv("ROUTER_LATENCY_ALPHA", "0.1"))
+
+    # Preload-then-fork server settings (python -m app.serve)
+    SERVE_HOST: str = os.getenv("SERVE_HOST", "0.0.0.0")
+    SERVE_PORT: int = int(os.getenv("SERVE_PORT", "8000"))
+    SERVE_WORKERS: int = int(os.getenv("SERVE_WORKERS", "2"))
+    # A worker that exits within SERVE_EARLY_EXIT_SECONDS of starting failed at startup; such
+    # workers are re-forked after a growing delay, and the server exits after this many in a row
+    SERVE_EARLY_EXIT_SECONDS: float = float(os.getenv("SERVE_EARLY_EXIT_SECONDS", "10"))
+    SERVE_RESPAWN_DELAY_SECONDS: float = float(os.getenv("SERVE_RESPAWN_DELAY_SECONDS", "1"))
+    SERVE_MAX_EARLY_FAILURES: int = int(os.getenv("SERVE_MAX_EARLY_FAILURES", "5"))
+
+    # Startup warm-up settings; /readyz fails until warm-up reaches steady state
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+    WARMUP_QUERIES: list = [
+        "How do I create a new user?",
+        "What is an API key?",
+        "configure webhook notifications",
+        "export report to csv",
+    ]
+    # Also load the cross-encoder and run it once
+    WARMUP_RERANK: bool = os.getenv("WARMUP_RERANK", "True").lower() == "true"
+    # Load the userguide table and its indexes into shared buffers with pg_prewarm
+    WARMUP_PREWARM: bool = os.getenv("WARMUP_PREWARM", "True").lower() == "true"
+    # Rounds of synthetic queries run until two consecutive rounds' mean
+    # latency differ by less than the tolerance (relative)
+    WARMUP_MAX_ROUNDS: int = int(os.getenv("WARMUP_MAX_ROUNDS", "10"))
+    WARMUP_STEADY_TOLERANCE: float = float(os.getenv("WARMUP_STEADY_TOLERANCE", "0.2"))
+    # Pause before retrying a failed warm-up; /readyz stays 503 until one succeeds
+    WARMUP_RETRY_SECONDS: float = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+
+    # Admission control settings
+    # Default number of requests an endpoint serves at once, overridable per endpoint
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+    ADMISSION_ENDPOINT_LIMITS: dict = {"query": 16, "cosinesimilarity": 8, "tfidf": 32, "hybrid": 8, "stream": 8}
+    # Requests allowed to wait for a slot before new ones are shed
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+    # Per-request deadline, measured from arrival
+    REQUEST_DEADLINE_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", "5.0"))
+    # Remaining budget below which the pipeline degrades
+    DEGRADE_SKIP_EXPANSION_SECONDS: float = float(os.getenv("DEGRADE_SKIP_EXPANSION_SECONDS", "2.0"))
+    DEGRADE_SKIP_VECTOR_SECONDS: float = float(os.getenv("DEGRADE_SKIP_VECTOR_SECONDS", "0.5"))
     
     class Config:
         env_file = ".env"
         case_sensitive = True
 
 # Create settings instance
-settings = Settings()
\ No newline at end of file
+settings = Settings()
+
+# Configure logging
+configure_logging(
+    level=settings.LOG_LEVEL,
+    log_file=settings.LOG_FILE,
+    json_format=settings.LOG_JSON,
+    queue_size=settings.LOG_QUEUE_SIZE
+)
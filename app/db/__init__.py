@@ -1 +1 @@
-from .database import engine,pg_engine,init_db
\ No newline at end of file
+from .database import engine,pg_engine,init_db,pool_status
\ No newline at end of file
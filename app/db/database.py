@@ -4,13 +4,26 @@ from sqlalchemy.ext.declarative import declarative_base
 from langchain_postgres import PGEngine
 
 from app.config import settings
+from app.db.pool import InstrumentedAsyncQueuePool
 
 DATABASE_URL = settings.DATABASE_URL
 
 if DATABASE_URL.startswith("postgresql+psycopg2"):
     DATABASE_URL = DATABASE_URL.replace("postgresql+psycopg2", "postgresql+asyncpg")
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    # Similarity searches reuse the same SQL text, so cache the prepared
+    # statements per connection instead of parsing/planning on every search
+    connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
 pg_engine = PGEngine.from_engine(engine=engine)
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -26,3 +39,7 @@ async def get_db():
         yield db
     finally:
         await db.close()
+
+def pool_status():
+    """Occupancy and checkout-wait statistics of the shared connection pool"""
+    return engine.pool.snapshot()
@@ -0,0 +1,79 @@
+"""
+Connection pool with checkout telemetry, so the pool can be sized from data.
+"""
+
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolStats:
+    """Counters collected on every connection checkout"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.saturated_checkouts = 0  # checkouts that found every connection in use
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait, saturated):
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if saturated:
+            self.saturated_checkouts += 1
+
+    def as_dict(self):
+        return {
+            "checkouts": self.checkouts,
+            "saturated_checkouts": self.saturated_checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": (self.total_wait / self.checkouts * 1000) if self.checkouts else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times how long callers wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _is_saturated(self):
+        if self._max_overflow < 0:
+            return False
+        return self.checkedout() >= self.size() + self._max_overflow
+
+    def _do_get(self):
+        saturated = self._is_saturated()
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record(time.perf_counter() - start, saturated)
+        return conn
+
+    def recreate(self):
+        # Keep counters across dispose()/recreate so they describe the process lifetime
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def snapshot(self):
+        """Current occupancy plus accumulated checkout statistics"""
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            **self.stats.as_dict(),
+        }
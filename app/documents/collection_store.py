@@ -0,0 +1,139 @@
+"""
+Custom document collections, each stored in its own pgvector table
+
+Every collection gets a table `collection_<id>` in CUSTOM_SCHEMA with its own
+HNSW index, so a search scans only that collection's vectors and an index
+build or drop never touches another collection.
+"""
+
+import logging
+import uuid
+
+from langchain_core.documents import Document
+from langchain_postgres import Column, PGVectorStore
+from langchain_postgres.v2.indexes import HNSWIndex
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import pg_engine
+from app.db.database import async_session_maker
+from app.models.document import Collection
+from .userguide_processor import SimplifiedUserGuideProcessor
+
+logger = logging.getLogger(__name__)
+
+METADATA_COLUMNS = ["title"]
+
+
+def document_id(collection_id, title, content):
+    """Id derived from the collection and the text, so re-sending a document updates it in place"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"collection:{collection_id}#{title}#{content}"))
+
+
+class CollectionStore:
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Singleton pattern to ensure only one instance exists"""
+        if cls._instance is None:
+            cls._instance = CollectionStore()
+        return cls._instance
+
+    def __init__(self):
+        # Vector stores of the collections searched so far, by collection id
+        self._vectorstores = {}
+
+    @property
+    def embeddings(self):
+        # Same model as the userguide, so one copy of the weights serves both
+        return SimplifiedUserGuideProcessor.get_instance().embeddings
+
+    async def _attach(self, collection):
+        self._vectorstores[collection.id] = await PGVectorStore.create(
+            engine=pg_engine,
+            schema_name=settings.CUSTOM_SCHEMA,
+            table_name=collection.table_name,
+            embedding_service=self.embeddings,
+            metadata_columns=METADATA_COLUMNS,
+        )
+        return self._vectorstores[collection.id]
+
+    def evict(self, collection_id):
+        """Forget a cached vector store, e.g. after another worker dropped its collection"""
+        self._vectorstores.pop(collection_id, None)
+
+    async def get_vectorstore(self, collection_id):
+        """Vector store over a collection's table, or None if there is no such collection"""
+        vectorstore = self._vectorstores.get(collection_id)
+        if vectorstore is None:
+            async with async_session_maker() as session:
+                collection = await session.get(Collection, collection_id)
+            if collection is None:
+                return None
+            vectorstore = await self._attach(collection)
+        return vectorstore
+
+    async def create(self, session, name, description=None):
+        """Register a collection and create its vector table and ANN index"""
+        collection = Collection(name=name, description=description)
+        session.add(collection)
+        # Flush for the id, which names the table; the row is only committed once the table exists
+        await session.flush()
+
+        await pg_engine.ainit_vectorstore_table(
+            table_name=collection.table_name,
+            vector_size=settings.VECTOR_SIZE,
+            schema_name=settings.CUSTOM_SCHEMA,
+            metadata_columns=[Column("title", "TEXT")],
+        )
+        vectorstore = await self._attach(collection)
+        # Index names are per schema, so each collection's index is named after its table
+        await vectorstore.aapply_vector_index(HNSWIndex(name=f"{collection.table_name}_hnsw"))
+
+        await session.commit()
+        await session.refresh(collection)
+        logger.info(f"Created collection '{name}' in {settings.CUSTOM_SCHEMA}.{collection.table_name}")
+        return collection
+
+    async def drop(self, session, collection):
+        """
+        Delete a collection together with its vector table. Other workers may still
+        hold its vector store; their searches evict it when the table is gone.
+        """
+        self.evict(collection.id)
+        await session.execute(
+            text(f'DROP TABLE IF EXISTS "{settings.CUSTOM_SCHEMA}"."{collection.table_name}"')
+        )
+        await session.delete(collection)
+        await session.commit()
+        logger.info(f"Dropped collection '{collection.name}'")
+
+    async def upsert(self, collection, documents, batch_size=64):
+        """
+        Embed and store (title, content, metadata, id) tuples, replacing any
+        document with the same id. Returns the ids in input order.
+        """
+        vectorstore = self._vectorstores.get(collection.id) or await self._attach(collection)
+
+        ids = []
+        batch = []
+        for title, content, metadata, doc_id in documents:
+            doc_id = doc_id or document_id(collection.id, title, content)
+            ids.append(doc_id)
+            batch.append(Document(id=doc_id, page_content=content, metadata={**metadata, "title": title}))
+            if len(batch) >= batch_size:
+                await vectorstore.aadd_documents(documents=batch, ids=[doc.id for doc in batch])
+                batch = []
+        if batch:
+            await vectorstore.aadd_documents(documents=batch, ids=[doc.id for doc in batch])
+        return ids
+
+    async def get_documents(self, collection, ids):
+        vectorstore = self._vectorstores.get(collection.id) or await self._attach(collection)
+        return await vectorstore.aget_by_ids(ids)
+
+    async def delete_documents(self, collection, ids):
+        vectorstore = self._vectorstores.get(collection.id) or await self._attach(collection)
+        await vectorstore.adelete(ids=ids)
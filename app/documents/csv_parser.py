@@ -1,7 +1,12 @@
 from app.config import settings
 from langchain_core.documents import Document
 import csv
+import logging
 import uuid
+from pathlib import Path
+from .dedup import deduplicate_documents
+
+logger = logging.getLogger(__name__)
 
 class CSVParser:
 
@@ -10,21 +15,87 @@ class CSVParser:
 
     def _load_documents_from_csv(self, csv_path = f"app/embeddings/userguide_v{settings.CSV_VERSION}.csv"):
         """Load documents from CSV file"""
-        documents = []
         with open(csv_path, 'r', encoding='utf-8') as file:
             reader = csv.DictReader(file)
-            for row in reader:
-                content = row.get('content') or row.get('enhancedContent')
-                if content:
-                    doc = Document(
-                        id=str(uuid.uuid4()),
-                        page_content=content,
-                        metadata={
-                            'headingTrace': row.get('headingTrace', ''),
-                            'pageTrace': row.get('pageTrace', ''),
-                            'page_id': row.get('page_id', ''),
-                            'section_id': row.get('section_id', '')
-                        }
-                    )
-                    documents.append(doc)
-        return documents
\ No newline at end of file
+            return list(self._deduplicate(self._documents_from_rows(reader)))
+
+    def _userguide_paths(self, csv_path=None):
+        """
+        Files the userguide is built from: the USERGUIDE_SOURCES markdown, or the
+        CSV at csv_path (default: the versioned userguide CSV) if csv_path is given
+        or no sources are configured
+        """
+        sources = [source.strip() for source in settings.USERGUIDE_SOURCES.split(",") if source.strip()]
+        if csv_path is not None or not sources:
+            return [Path(csv_path or f"app/embeddings/userguide_v{settings.CSV_VERSION}.csv")]
+
+        from app.utils.convert_userguide import expand_inputs
+        paths = expand_inputs(sources)
+        if not paths:
+            raise ValueError(f"USERGUIDE_SOURCES matched no markdown files: {settings.USERGUIDE_SOURCES}")
+        return paths
+
+    def _iter_userguide_rows(self, csv_path=None):
+        """Converter rows of the userguide, read from the CSV or converted from markdown in memory"""
+        paths = self._userguide_paths(csv_path)
+        if paths[0].suffix != ".csv":
+            from app.utils.convert_userguide import iter_rows
+            yield from iter_rows(paths)
+            return
+        with open(paths[0], 'r', encoding='utf-8') as file:
+            yield from csv.DictReader(file)
+
+    def _load_userguide_documents(self, csv_path=None):
+        """Deduplicated userguide documents, in the same order the vector table receives them"""
+        return list(self._deduplicate(self._documents_from_rows(self._iter_userguide_rows(csv_path))))
+
+    def _deduplicate(self, documents):
+        """Collapse near-duplicate documents into one canonical document per cluster"""
+        if not settings.DEDUP_ENABLED:
+            yield from documents
+            return
+
+        stats = {}
+        yield from deduplicate_documents(
+            documents,
+            stats,
+            threshold=settings.DEDUP_THRESHOLD,
+            num_perm=settings.DEDUP_NUM_PERM,
+            bands=settings.DEDUP_BANDS,
+            shingle_size=settings.DEDUP_SHINGLE_SIZE
+        )
+        total = stats.get("input", 0)
+        removed = stats.get("duplicates", 0)
+        if total:
+            logger.info(
+                f"Near-duplicate pass: {total} -> {total - removed} documents "
+                f"({removed / total:.1%} smaller index)"
+            )
+
+    @staticmethod
+    def _document_id(metadata, content):
+        """
+        Id derived from the document's position and text, so the TF-IDF index and
+        the vector table agree on it and it survives reloads of the same CSV
+        """
+        key = f"{metadata['pageTrace']}#{metadata.get('chunk_index', 0)}#{content}"
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+    def _documents_from_rows(self, rows):
+        """Turn converter rows (CSV or streamed) into documents, lazily"""
+        for row in rows:
+            content = row.get('content') or row.get('enhancedContent')
+            if content:
+                metadata = {
+                    'headingTrace': row.get('headingTrace', ''),
+                    'pageTrace': row.get('pageTrace', ''),
+                    'page_id': row.get('page_id', ''),
+                    'section_id': row.get('section_id', '')
+                }
+                if row.get('chunk_index') not in (None, ''):
+                    metadata['chunk_index'] = int(row['chunk_index'])
+                yield Document(
+                    id=self._document_id(metadata, content),
+                    page_content=content,
+                    metadata=metadata
+                )
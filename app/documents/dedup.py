@@ -0,0 +1,113 @@
+"""
+MinHash near-duplicate detection for documents at ingest time
+"""
+
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+# Mersenne prime used for the universal hash permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+class MinHasher:
+    """MinHash signatures over word shingles"""
+
+    def __init__(self, num_perm=64, shingle_size=3, seed=1):
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def shingles(self, text):
+        tokens = re.findall(r'\w+', text.lower())
+        if len(tokens) <= self.shingle_size:
+            return {' '.join(tokens)}
+        return {
+            ' '.join(tokens[i:i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+
+    def signature(self, text):
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+            for shingle in self.shingles(text)
+        ]
+        return tuple(
+            min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self.permutations
+        )
+
+
+def estimated_jaccard(sig_a, sig_b):
+    """Fraction of matching MinHash values, an estimate of shingle-set Jaccard similarity"""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over MinHash signatures. Signatures are split into bands; two
+    documents become candidates if any band matches exactly, and are near
+    duplicates if their estimated Jaccard similarity reaches the threshold.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = defaultdict(list)
+        self._signatures = []
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def find(self, signature):
+        """Index of an already added near duplicate of signature, or None"""
+        checked = set()
+        for key in self._band_keys(signature):
+            for idx in self._buckets.get(key, ()):
+                if idx in checked:
+                    continue
+                checked.add(idx)
+                if estimated_jaccard(signature, self._signatures[idx]) >= self.threshold:
+                    return idx
+        return None
+
+    def add(self, signature):
+        idx = len(self._signatures)
+        self._signatures.append(signature)
+        for key in self._band_keys(signature):
+            self._buckets[key].append(idx)
+        return idx
+
+
+def deduplicate_documents(documents, stats, threshold=0.85, num_perm=64, bands=16, shingle_size=3):
+    """
+    Yield one canonical document per near-duplicate cluster: the first
+    member seen. Later members are not yielded; their metadata is appended
+    to the canonical document's `duplicates` list instead. Counts are
+    accumulated in `stats` as documents are consumed, so this works on streams.
+    """
+    hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+    index = NearDuplicateIndex(threshold=threshold, num_perm=num_perm, bands=bands)
+    canonical = []
+
+    for document in documents:
+        stats["input"] = stats.get("input", 0) + 1
+        signature = hasher.signature(document.page_content)
+        match = index.find(signature)
+        if match is not None:
+            stats["duplicates"] = stats.get("duplicates", 0) + 1
+            canonical[match].metadata.setdefault("duplicates", []).append(dict(document.metadata))
+            continue
+        index.add(signature)
+        canonical.append(document)
+        stats["canonical"] = stats.get("canonical", 0) + 1
+        yield document
@@ -8,6 +8,9 @@ from .csv_parser import CSVParser
 
 logger = logging.getLogger(__name__)
 
+# Bump when cached documents change shape (e.g. how ids are assigned)
+TFIDF_CACHE_VERSION = 3
+
 class PersistentTFIDFProcessor(CSVParser):
     _instance = None
     
@@ -23,27 +26,48 @@ class PersistentTFIDFProcessor(CSVParser):
         self.tfidf_retriever = None
         self.tfidf_path = settings.TFIDF_CACHE_PATH
         
-    def initialize(self, csv_path="app/embeddings/userguide_v1.csv", force_rebuild=False):
-        """Initialize the TF-IDF retriever - either load from disk or build new"""
+    def _source_fingerprint(self, csv_path=None):
+        """Path, size and modification time of each file the index is built from"""
+        fingerprint = []
+        for path in self._userguide_paths(csv_path):
+            stat = os.stat(path)
+            fingerprint.append((str(path), stat.st_size, stat.st_mtime_ns))
+        return fingerprint
+
+    def initialize(self, csv_path=None, force_rebuild=False):
+        """
+        Initialize the TF-IDF retriever - either load from disk or build new.
+        Built from USERGUIDE_SOURCES markdown if configured, else from the CSV.
+        """
+        sources = self._source_fingerprint(csv_path)
         # Try to load existing model if it exists and not forcing rebuild
         if os.path.exists(self.tfidf_path) and not force_rebuild:
             try:
                 with open(self.tfidf_path, 'rb') as f:
-                    self.tfidf_retriever = pickle.load(f)
-                return self.tfidf_retriever
+                    cached = pickle.load(f)
+                # Caches from before versioning, from an older document id scheme, or
+                # built from other (or since modified) source files are rebuilt
+                if (isinstance(cached, dict) and cached.get("version") == TFIDF_CACHE_VERSION
+                        and cached.get("sources") == sources):
+                    self.tfidf_retriever = cached["retriever"]
+                    return self.tfidf_retriever
+                logger.info("TF-IDF cache is out of date, rebuilding")
             except Exception as e:
                 
                 logger.warning(f"Error loading TF-IDF model, rebuilding: {e}")
         
         # Build new model
         logger.info("Building TF-IDF retriever...")
-        documents = self._load_documents_from_csv(csv_path)
+        documents = self._load_userguide_documents(csv_path)
         self.tfidf_retriever = TFIDFRetriever.from_documents(documents)
+        # from_documents rebuilds the documents from text and metadata only, dropping
+        # their ids; keep the originals (same order) so hits share ids with the vector leg
+        self.tfidf_retriever.docs = documents
         
         # Save to disk for future use
         os.makedirs(os.path.dirname(self.tfidf_path), exist_ok=True)
         with open(self.tfidf_path, 'wb') as f:
-            pickle.dump(self.tfidf_retriever, f)
+            pickle.dump({"version": TFIDF_CACHE_VERSION, "sources": sources, "retriever": self.tfidf_retriever}, f)
             
         return self.tfidf_retriever
     
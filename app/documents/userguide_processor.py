@@ -32,21 +32,43 @@ class SimplifiedUserGuideProcessor(CSVParser):
         # Connection string from config
         self.connection_string = settings.DATABASE_URL
 
-    async def process_csv_to_vectorstore(self):
-        """Process CSV and store directly in pgvector."""
-        
-        # 1. Read CSV
-        documents = self._load_documents_from_csv()
-        
+    async def attach_vectorstore(self, index_query_options=None):
+        """Connect to the existing userguide table without loading documents."""
         self.vectorstore = await PGVectorStore.create(
             engine=pg_engine,
             schema_name=settings.USERGUIDE_SCHEMA,
             table_name=settings.USERGUIDE_TABLE,
             embedding_service=self.embeddings,
-            metadata_columns=["headingTrace", "pageTrace","page_id","section_id"]
-        )        
+            metadata_columns=["headingTrace", "pageTrace","page_id","section_id"],
+            index_query_options=index_query_options
+        )
+        return self.vectorstore
 
-        await self.vectorstore.aadd_documents(documents=documents)        
-        
+    async def process_userguide_to_vectorstore(self):
+        """Embed the userguide (USERGUIDE_SOURCES markdown, else the CSV) and store it in pgvector."""
+        await self.attach_vectorstore()
+        await self.process_rows_to_vectorstore(self._iter_userguide_rows())
         return self.vectorstore
 
+    async def process_rows_to_vectorstore(self, rows, batch_size=64):
+        """
+        Embed and store converter rows (CSV or converted markdown) as they arrive.
+        Near duplicates of rows already flushed are dropped without being recorded
+        on their canonical document, since that has already been stored.
+        """
+        if not getattr(self, 'vectorstore', None):
+            await self.attach_vectorstore()
+
+        count = 0
+        batch = []
+        for document in self._deduplicate(self._documents_from_rows(rows)):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                await self.vectorstore.aadd_documents(documents=batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            await self.vectorstore.aadd_documents(documents=batch)
+            count += len(batch)
+        return count
+
@@ -1,16 +1,23 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+import asyncio
 import os
 import subprocess
 import sys
 import logging
 from .config import settings
 from fastapi.middleware.cors import CORSMiddleware
-import nltk
-from app.routers import query
+from app.routers import query, admin, collections
 from contextlib import asynccontextmanager
 from app.db import init_db, engine, pg_engine
 from app.documents.tfidf_processor import PersistentTFIDFProcessor
 from app.documents.userguide_processor import SimplifiedUserGuideProcessor
+from app.utils.query_expander import QueryExpander
+from app.utils.query_router import QueryRouter
+from app.tracing import RequestTracingMiddleware
+from app.profiling import RequestProfilingMiddleware
+from app.preload import download_nltk_data, is_preloaded, log_memory_usage
+from app.warmup import WarmupStatus, run_warmup
 
 logger = logging.getLogger(__name__)
 
@@ -50,42 +57,57 @@ def start_postgres():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create cache directories if they don't exist
-    os.makedirs(settings.MODEL_CACHE_DIR, exist_ok=True)
-    os.makedirs(settings.EMBEDDING_CACHE_DIR, exist_ok=True)
-
-    # Set environment variable for Hugging Face cache
-    os.environ["HF_HOME"] = settings.MODEL_CACHE_DIR
-
-    # Check if PostgreSQL is running and start if needed
-    
-    if not check_postgres_running():
-        if not start_postgres():
-            logger.critical("Could not start PostgreSQL server. Exiting...")
-            sys.exit(1)
-
-    # Startup: Initialize resources
-    await init_db()
-    
-    # need to download this for use in query preprocessing
-    nltk.download("stopwords")
-    nltk.download('punkt_tab')
-    nltk.download('wordnet')
-    # Initialize TF-IDF retriever
-    tfidf_processor = PersistentTFIDFProcessor.get_instance()
-    tfidf_processor.initialize()
-
-    # Initialize vector store
-    # The constructor already sets up the connection
-    simplified_ug_processor = SimplifiedUserGuideProcessor.get_instance()
-    await simplified_ug_processor.process_csv_to_vectorstore()
-
+    if is_preloaded():
+        # Forked from app.serve: models, TF-IDF index and corpora are already
+        # in memory and the table is populated, only the DB connection is per worker
+        simplified_ug_processor = SimplifiedUserGuideProcessor.get_instance()
+        await simplified_ug_processor.attach_vectorstore()
+    else:
+        # Create cache directories if they don't exist
+        os.makedirs(settings.MODEL_CACHE_DIR, exist_ok=True)
+        os.makedirs(settings.EMBEDDING_CACHE_DIR, exist_ok=True)
+
+        # Set environment variable for Hugging Face cache
+        os.environ["HF_HOME"] = settings.MODEL_CACHE_DIR
+
+        # Check if PostgreSQL is running and start if needed
+        
+        if not check_postgres_running():
+            if not start_postgres():
+                logger.critical("Could not start PostgreSQL server. Exiting...")
+                sys.exit(1)
+
+        # Startup: Initialize resources
+        await init_db()
+        
+        download_nltk_data()
+        # Initialize TF-IDF retriever
+        tfidf_processor = PersistentTFIDFProcessor.get_instance()
+        tfidf_processor.initialize()
+        QueryExpander.load_expansion_table()
+        QueryRouter.get_instance()
+
+        # Initialize vector store
+        # The constructor already sets up the connection
+        simplified_ug_processor = SimplifiedUserGuideProcessor.get_instance()
+        await simplified_ug_processor.process_userguide_to_vectorstore()
+
+    log_memory_usage("worker")
     logger.info("Resources initialized, application ready")
 
+    # Warm up in the background: /healthz answers meanwhile, /readyz holds traffic back
+    warmup_task = None
+    if settings.WARMUP_ENABLED:
+        warmup_task = asyncio.create_task(run_warmup())
+    else:
+        WarmupStatus.get_instance().mark_ready()
+
     yield  # Application runs here
 
     # Shutdown: Clean up resources
     logger.info("Shutting down and cleaning up resources")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
     
     # Clean up resources
     # Release the vector store connections
@@ -116,11 +138,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request profiling (X-Profile: 1), switched at runtime via /admin/profile/requests;
+# inside tracing so profiles are named by request id
+app.add_middleware(RequestProfilingMiddleware)
+
+# Request ids and sampled tracing; added last so it wraps every other layer
+app.add_middleware(RequestTracingMiddleware, sample_rate=settings.TRACE_SAMPLE_RATE)
+
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the RAG API"}
 
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop is responsive"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 503 until warm-up has brought latency to steady state"""
+    warmup = WarmupStatus.get_instance()
+    return JSONResponse(
+        status_code=200 if warmup.ready else 503,
+        content={"status": "ready" if warmup.ready else "warming_up", **warmup.as_dict()}
+    )
+
+
 app.include_router(query.router, prefix="/api/v1")
+app.include_router(collections.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
 # app.include_router(agents.router, prefix="/api/v1")
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, Integer, String, Text, func
+
+from app.config import settings
+from app.db.database import Base
+
+
+class Collection(Base):
+    """A named set of custom documents; its vectors live in a table of their own"""
+
+    __tablename__ = "collections"
+    __table_args__ = {"schema": settings.CUSTOM_SCHEMA}
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+    description = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+
+    @property
+    def table_name(self):
+        """Vector table holding this collection's documents, in CUSTOM_SCHEMA"""
+        return f"collection_{self.id}"
@@ -0,0 +1,112 @@
+"""
+Load heavy, read-only artifacts once in a parent process so forked workers
+share them copy-on-write instead of each holding a private copy.
+"""
+
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import resource
+
+import nltk
+from nltk.stem import WordNetLemmatizer
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_preloaded = False
+
+
+def is_preloaded():
+    """True in workers forked from a parent that ran preload_artifacts()"""
+    return _preloaded
+
+
+def download_nltk_data():
+    # need to download this for use in query preprocessing
+    nltk.download("stopwords")
+    nltk.download('punkt_tab')
+    nltk.download('wordnet')
+
+
+def _ingest_userguide():
+    """Create the userguide table and load documents into it (runs in a spawned process)"""
+    from app.db import init_db, engine
+    from app.documents.userguide_processor import SimplifiedUserGuideProcessor
+
+    async def ingest():
+        await init_db()
+        await SimplifiedUserGuideProcessor.get_instance().process_userguide_to_vectorstore()
+        await engine.dispose()
+
+    asyncio.run(ingest())
+
+
+def preload_artifacts():
+    """
+    Load model weights, the TF-IDF index and NLTK corpora into this process.
+
+    Document ingestion runs the embedding model, which starts torch's OpenMP
+    thread pool; that pool does not survive fork, so ingestion happens in a
+    spawned child and this process only loads weights without running them.
+    """
+    global _preloaded
+    from app.documents.tfidf_processor import PersistentTFIDFProcessor
+    from app.documents.userguide_processor import SimplifiedUserGuideProcessor
+    from app.utils.query_expander import QueryExpander
+    from app.utils.query_router import QueryRouter
+    from app.utils.reranker import CrossEncoderReranker
+
+    os.makedirs(settings.MODEL_CACHE_DIR, exist_ok=True)
+    os.makedirs(settings.EMBEDDING_CACHE_DIR, exist_ok=True)
+    os.environ["HF_HOME"] = settings.MODEL_CACHE_DIR
+
+    download_nltk_data()
+
+    ingest = multiprocessing.get_context("spawn").Process(target=_ingest_userguide)
+    ingest.start()
+    ingest.join()
+    if ingest.exitcode != 0:
+        raise RuntimeError(f"Userguide ingestion failed with exit code {ingest.exitcode}")
+
+    # Materialise wordnet now rather than lazily in every worker
+    WordNetLemmatizer().lemmatize("warm")
+
+    PersistentTFIDFProcessor.get_instance().initialize()
+    QueryExpander.load_expansion_table()
+    QueryRouter.get_instance()
+    SimplifiedUserGuideProcessor.get_instance()
+    if settings.RERANK_PRELOAD:
+        # Accessing the model loads its weights; workers only run it
+        _ = CrossEncoderReranker.get_instance().model
+
+    # Move everything loaded so far out of the collector's generations, so
+    # gc passes in the workers don't write to (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+
+    _preloaded = True
+    log_memory_usage("preload")
+
+
+def memory_usage():
+    """Resident, proportional and shared memory of this process, in MB"""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    usage[key] = int(value.split()[0]) / 1024
+    except OSError:
+        # Not Linux: only peak RSS is available
+        usage["MaxRss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+
+def log_memory_usage(label):
+    usage = ", ".join(f"{key}={value:.1f}MB" for key, value in memory_usage().items())
+    logger.info(f"Memory usage [{label}] pid={os.getpid()}: {usage}")
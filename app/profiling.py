@@ -0,0 +1,253 @@
+"""
+On-demand profiling of a running worker.
+
+Two tools, both off unless asked for:
+- A wall-clock sampling profiler that snapshots every thread's stack with
+  sys._current_frames() for N seconds and writes collapsed stacks
+  (`frame;frame;frame count` lines, the input format of flamegraph.pl and
+  speedscope). It runs in its own thread only while active.
+- Per-request profiling triggered by an `X-Profile: 1` header, through
+  pyinstrument (HTML flamegraph) when installed, else cProfile (pstats dump).
+  It starts as PROFILING_ENABLED says and is switched at runtime through the
+  admin router; while off, each request costs one flag check.
+
+Artifacts are written to PROFILE_DIR and served by the admin router. Each
+worker profiles only itself, so artifact names carry the worker's pid.
+"""
+
+import asyncio
+import cProfile
+import ctypes
+import hmac
+import logging
+import marshal
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from app.config import settings
+from app.tracing import request_id_var
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # pyinstrument is optional; fall back to cProfile
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+ARTIFACT_HEADER = "x-profile-artifact"
+
+ARTIFACT_NAME = re.compile(r"^[\w.-]+$")
+
+_sampler = None
+_request_profile_active = False
+# Shared memory created before app.serve forks, so switching it in one worker
+# switches it in all of them; otherwise it is per process
+_request_profiling = multiprocessing.RawValue(ctypes.c_bool, settings.PROFILING_ENABLED)
+
+
+def admin_token_valid(token):
+    """True if admin access is configured and token matches it"""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    # compare_digest only accepts ASCII str; compare bytes so any header value is a plain mismatch
+    return hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+def request_profiling_enabled():
+    return _request_profiling.value
+
+
+def set_request_profiling(enabled):
+    """Turn profiling of requests carrying `X-Profile: 1` on or off"""
+    _request_profiling.value = enabled
+    logger.info(f"Per-request profiling {'enabled' if enabled else 'disabled'}")
+
+
+def artifact_path(name):
+    """Path of an artifact in PROFILE_DIR, or None if the name is not a plain file name"""
+    if not ARTIFACT_NAME.match(name):
+        return None
+    return os.path.join(settings.PROFILE_DIR, name)
+
+
+def list_artifacts():
+    """Artifacts on disk, newest first"""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    entries = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append({"name": entry.name, "bytes": stat.st_size, "modified": stat.st_mtime})
+    return sorted(entries, key=lambda e: e["modified"], reverse=True)
+
+
+def _write_artifact(name, data):
+    """Write an artifact and prune the oldest ones beyond PROFILE_MAX_ARTIFACTS"""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = artifact_path(name)
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(path, mode) as f:
+        f.write(data)
+    for stale in list_artifacts()[settings.PROFILE_MAX_ARTIFACTS:]:
+        os.remove(os.path.join(settings.PROFILE_DIR, stale["name"]))
+    return path
+
+
+def _frame_label(code):
+    filename = "/".join(code.co_filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, thread_name):
+    """Root-first `;`-joined stack of a frame, prefixed with its thread's name"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Samples the stacks of every other thread in this process at a fixed interval"""
+
+    def __init__(self, seconds, interval_ms):
+        self.seconds = seconds
+        self.interval = interval_ms / 1000
+        self.name = f"sample-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.collapsed"
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                self.stacks[collapse_stack(frame, names.get(ident, str(ident)))] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _run(self):
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline and not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+        _write_artifact(self.name, self.collapsed())
+        logger.info(f"Sampling profile written to {self.name} ({self.samples} samples)")
+
+    def as_dict(self):
+        return {"artifact": self.name, "running": self.running, "seconds": self.seconds, "samples": self.samples}
+
+
+def start_sampling(seconds, interval_ms=None):
+    """Start the worker-wide sampling profiler; None if one is already running"""
+    global _sampler
+    if _sampler is not None and _sampler.running:
+        return None
+    interval_ms = settings.PROFILE_SAMPLE_INTERVAL_MS if interval_ms is None else interval_ms
+    _sampler = SamplingProfiler(min(seconds, settings.PROFILE_MAX_SECONDS), interval_ms)
+    _sampler.start()
+    return _sampler
+
+
+def stop_sampling():
+    """Stop the sampling profiler early, writing what it has; None if none was started"""
+    if _sampler is not None and _sampler.running:
+        _sampler.stop()
+    return _sampler
+
+
+def current_sampler():
+    return _sampler
+
+
+class RequestProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that carry `X-Profile: 1` and a valid
+    `X-Admin-Token`. The artifact name is returned in `X-Profile-Artifact`.
+
+    pyinstrument follows only the profiled request's task. cProfile profiles
+    the whole event loop thread, so other requests served meanwhile show up
+    in its output too. One request is profiled at a time; others that ask
+    while one is in progress are served without profiling.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _request_profile_active
+        # The whole cost while profiling is switched off
+        if not _request_profiling.value or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER.encode()) != b"1" or _request_profile_active:
+            await self.app(scope, receive, send)
+            return
+        # latin-1 like Starlette's Header(): any bytes decode, so a bad token is a mismatch, not a 500
+        if not admin_token_valid(headers.get(ADMIN_TOKEN_HEADER.encode(), b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        # Request ids come from a client header: keep them to a safe file name
+        request_id = re.sub(r"[^\w.-]", "_", request_id_var.get() or str(time.time_ns()))[:64]
+        extension = "html" if PyinstrumentProfiler is not None else "prof"
+        name = f"request-{request_id}-{os.getpid()}.{extension}"
+
+        async def send_with_artifact(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (ARTIFACT_HEADER.encode(), name.encode())
+                ]
+            await send(message)
+
+        _request_profile_active = True
+        try:
+            if PyinstrumentProfiler is not None:
+                profiler = PyinstrumentProfiler(async_mode="enabled")
+                profiler.start()
+                try:
+                    await self.app(scope, receive, send_with_artifact)
+                finally:
+                    profiler.stop()
+                output = profiler.output_html()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send_with_artifact)
+                finally:
+                    profiler.disable()
+                profiler.create_stats()
+                # Same bytes Profile.dump_stats writes, loadable with pstats or snakeviz
+                output = marshal.dumps(profiler.stats)
+        finally:
+            _request_profile_active = False
+
+        await asyncio.to_thread(_write_artifact, name, output)
+        logger.info(f"Request profile written to {name}")
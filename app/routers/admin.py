@@ -0,0 +1,95 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse
+
+from app.db import pool_status
+from app.profiling import (
+    admin_token_valid,
+    artifact_path,
+    current_sampler,
+    list_artifacts,
+    request_profiling_enabled,
+    set_request_profiling,
+    start_sampling,
+    stop_sampling,
+)
+from app.tracing import log_queue_status
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Reject callers without the configured X-Admin-Token; with none configured, reject everyone"""
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/db/pool")
+async def get_pool_status():
+    """Connection pool occupancy, checkout-wait time and saturation counters"""
+    return pool_status()
+
+
+@router.get("/logging")
+async def get_logging_status():
+    """Log queue backlog and records dropped because it was full, for this worker"""
+    return log_queue_status()
+
+
+@router.post("/profile/sample")
+async def start_sampling_profile(seconds: float = 10, interval_ms: Optional[float] = None):
+    """Sample every thread of this worker for `seconds`, writing collapsed stacks when done"""
+    if seconds <= 0 or (interval_ms is not None and interval_ms <= 0):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="seconds and interval_ms must be positive")
+    sampler = start_sampling(seconds, interval_ms)
+    if sampler is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A sampling profile is already running")
+    return sampler.as_dict()
+
+
+@router.get("/profile/sample")
+async def get_sampling_profile():
+    """State of this worker's latest sampling profile"""
+    sampler = current_sampler()
+    if sampler is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No sampling profile has been started")
+    return sampler.as_dict()
+
+
+@router.delete("/profile/sample")
+async def stop_sampling_profile():
+    """Stop the running sampling profile early and write what it has collected"""
+    sampler = stop_sampling()
+    if sampler is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No sampling profile has been started")
+    return sampler.as_dict()
+
+
+@router.get("/profile/requests")
+async def get_request_profiling():
+    """Whether requests carrying `X-Profile: 1` are profiled"""
+    return {"enabled": request_profiling_enabled()}
+
+
+@router.put("/profile/requests")
+async def switch_request_profiling(enabled: bool):
+    """Switch per-request profiling on or off without a restart"""
+    set_request_profiling(enabled)
+    return {"enabled": request_profiling_enabled()}
+
+
+@router.get("/profile/artifacts")
+async def get_profile_artifacts():
+    """Profiles written by this host's workers, newest first"""
+    return {"profiling_enabled": request_profiling_enabled(), "artifacts": list_artifacts()}
+
+
+@router.get("/profile/artifacts/{name}")
+async def download_profile_artifact(name: str):
+    path = artifact_path(name)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Artifact {name} not found")
+    media_type = "text/html" if name.endswith(".html") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
@@ -0,0 +1,89 @@
+from typing import List
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_db
+from app.documents.collection_store import CollectionStore
+from app.models.document import Collection
+from app.schemas.document import (
+    BulkUpsertRequest,
+    BulkUpsertResponse,
+    CollectionCreate,
+    CollectionDocument,
+    CollectionResponse,
+)
+from app.utils.admission import admit
+
+router = APIRouter(prefix="/collections", tags=["collections"])
+
+
+async def _get_collection(db, collection_id):
+    collection = await db.get(Collection, collection_id)
+    if collection is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Collection {collection_id} not found")
+    return collection
+
+
+@router.post("", response_model=CollectionResponse, status_code=status.HTTP_201_CREATED)
+async def create_collection(collection: CollectionCreate, db: AsyncSession = Depends(get_db)):
+    """Create a collection with its own vector table and HNSW index"""
+    existing = await db.scalar(select(Collection).where(Collection.name == collection.name))
+    if existing is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Collection '{collection.name}' already exists")
+    return await CollectionStore.get_instance().create(db, collection.name, collection.description)
+
+
+@router.get("", response_model=List[CollectionResponse])
+async def list_collections(db: AsyncSession = Depends(get_db)):
+    result = await db.scalars(select(Collection).order_by(Collection.id))
+    return result.all()
+
+
+@router.get("/{collection_id}", response_model=CollectionResponse)
+async def get_collection(collection_id: int, db: AsyncSession = Depends(get_db)):
+    return await _get_collection(db, collection_id)
+
+
+@router.delete("/{collection_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_collection(collection_id: int, db: AsyncSession = Depends(get_db)):
+    """Delete a collection and drop its vector table"""
+    collection = await _get_collection(db, collection_id)
+    await CollectionStore.get_instance().drop(db, collection)
+
+
+@router.put("/{collection_id}/documents", response_model=BulkUpsertResponse, dependencies=[Depends(admit("upsert"))])
+async def upsert_documents(collection_id: int, request: BulkUpsertRequest, db: AsyncSession = Depends(get_db)):
+    """Insert or replace documents by id, embedding them in batches"""
+    collection = await _get_collection(db, collection_id)
+    ids = await CollectionStore.get_instance().upsert(
+        collection,
+        (
+            (doc.title, doc.content, doc.metadata, str(doc.id) if doc.id else None)
+            for doc in request.documents
+        )
+    )
+    return BulkUpsertResponse(ids=ids)
+
+
+@router.get("/{collection_id}/documents/{document_id}", response_model=CollectionDocument)
+async def get_document(collection_id: int, document_id: UUID, db: AsyncSession = Depends(get_db)):
+    collection = await _get_collection(db, collection_id)
+    documents = await CollectionStore.get_instance().get_documents(collection, [str(document_id)])
+    if not documents:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Document {document_id} not found")
+    metadata = dict(documents[0].metadata)
+    return CollectionDocument(
+        id=str(document_id),
+        title=metadata.pop("title"),
+        content=documents[0].page_content,
+        metadata=metadata
+    )
+
+
+@router.delete("/{collection_id}/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(collection_id: int, document_id: UUID, db: AsyncSession = Depends(get_db)):
+    collection = await _get_collection(db, collection_id)
+    await CollectionStore.get_instance().delete_documents(collection, [str(document_id)])
@@ -1,75 +1,163 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.exc import ProgrammingError
 import asyncio
+import logging
+import time
+from typing import Literal, Optional
 
 from app.utils.query_preprocessor import QueryPreprocessor
 from app.utils.query_classification import QueryClassifier
 from app.utils.query_expander import QueryExpander
+from app.utils.query_router import LegLatencyTracker, QueryRouter
+from app.utils.reranker import CrossEncoderReranker
+from app.utils.response_shaping import dumps, result_key, shape_results, shaped_response
 from app.documents import SimplifiedUserGuideProcessor
+from app.documents.collection_store import CollectionStore
 from app.documents.tfidf_processor import PersistentTFIDFProcessor
+from app.utils.admission import (
+    AdmissionController,
+    admit,
+    deadline_within,
+    run_with_deadline,
+    start_deadline,
+)
+from app.config import settings
+from app.tracing import trace_span
 from itertools import chain
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["query"])
 
-@router.post("userguide/query")
-async def enhanced_search(query: str, k: int = 5):
+# Keyword classifier labels mapped onto router routes
+CLASSIFIER_ROUTES = {"factual": "tfidf", "semantic": "vector", "hybrid": "hybrid"}
+
+@router.post("userguide/query", dependencies=[Depends(admit("query"))])
+async def enhanced_search(query: str, k: int = 5, rerank: bool = False, rerank_budget_ms: Optional[float] = None,
+        view: Literal["full", "snippet", "ids"] = "full", fields: Optional[str] = None, snippet_chars: int = 200,
+        collection_id: Optional[int] = None):
     """
-    Complete search pipeline with preprocessing, classification, and expansion.
+    Complete search pipeline with preprocessing, routing, expansion and optional reranking.
+    With a collection_id, searches that collection instead of the userguide.
     """
+    n_candidates = _candidate_count(k, rerank)
     preprocessor = QueryPreprocessor()
-    classifier = QueryClassifier()
     # Preprocess
-    preprocessed_query = preprocessor.preprocess(query)
+    with trace_span("preprocess"):
+        preprocessed_query = preprocessor.preprocess(query)
     
-    # Classify
-    query_type = classifier.classify(preprocessed_query)
-        
-    # Search based on query type
-    if query_type == "factual":
-        results = await query_with_tfidf(query,k)
-    elif query_type == "semantic":
-        results = await query_userguide_cosine_sim(query,k)
+    # Route: the embedding computed here is reused by the vector leg
+    query_embedding = None
+    if collection_id is not None:
+        # The TF-IDF index and the router's calibration only cover the userguide
+        route = "vector"
+    else:
+        query_router = QueryRouter.get_instance()
+        with trace_span("route", calibrated=query_router.is_calibrated):
+            if query_router.is_calibrated:
+                processor = SimplifiedUserGuideProcessor.get_instance()
+                query_embedding = await processor.embeddings.aembed_query(preprocessed_query)
+                route = query_router.route(query_embedding)
+            else:
+                # Classify the raw query, where phrases like "what is" are still intact
+                route = CLASSIFIER_ROUTES[QueryClassifier().classify(query)]
+
+        # Not enough budget left for a vector search: answer lexically
+        if route != "tfidf" and deadline_within(settings.DEGRADE_SKIP_VECTOR_SECONDS):
+            route = "tfidf"
+
+    # Search based on route
+    if route == "tfidf":
+        results = await _tfidf_search(preprocessed_query, n_candidates)
+    elif route == "vector":
+        results = await _vector_search(preprocessed_query, n_candidates, query_embedding, collection_id)
         for res in results:
             res.pop('score')
     else:
-        results = await hybrid_search(query,k)
-    return results
+        results = await _hybrid_search(preprocessed_query, n_candidates, query_embedding)
+    results = await _maybe_rerank(query, results, k, rerank, rerank_budget_ms)
+    return shaped_response(results, query, view, fields, snippet_chars)
 
-@router.post("userguide/query/cosinesimilarity")
-async def query_userguide_cosine_sim(query: str, k: int = 3):
-    """Query the userguide vector store."""
+@router.post("userguide/query/cosinesimilarity", dependencies=[Depends(admit("cosinesimilarity"))])
+async def query_userguide_cosine_sim(query: str, k: int = 3, rerank: bool = False, rerank_budget_ms: Optional[float] = None,
+        view: Literal["full", "snippet", "ids"] = "full", fields: Optional[str] = None, snippet_chars: int = 200,
+        collection_id: Optional[int] = None):
+    """Query the userguide vector store, or a collection's."""
     preprocessor = QueryPreprocessor()
     # Preprocess the query
     preprocessed_query = preprocessor.preprocess(query)
+    results = await _vector_search(preprocessed_query, _candidate_count(k, rerank), collection_id=collection_id)
+    results = await _maybe_rerank(query, results, k, rerank, rerank_budget_ms)
+    return shaped_response(results, query, view, fields, snippet_chars)
 
-    expander = QueryExpander()
-    
-    # Expand query and search
-    expanded_queries = expander.expand_with_synonyms(query=preprocessed_query)
+
+def _collection_not_found(collection_id):
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Collection {collection_id} not found")
+
+
+async def _vectorstore_for(collection_id):
+    """The userguide vector store, or the partition holding a collection"""
+    if collection_id is None:
+        return SimplifiedUserGuideProcessor.get_instance().vectorstore
+    vectorstore = await CollectionStore.get_instance().get_vectorstore(collection_id)
+    if vectorstore is None:
+        raise _collection_not_found(collection_id)
+    return vectorstore
+
+
+async def _vector_search(preprocessed_query, k, query_embedding=None, collection_id=None):
+    """
+    Vector search over the expanded query; query_embedding, if given, is that of preprocessed_query.
+    Collections are searched with the query as is, since the expansion table is mined from the userguide.
+    """
+    start = time.perf_counter()
+    vectorstore = await _vectorstore_for(collection_id)
+
+    # Expand query and search, unless the deadline is too close for the extra searches
+    if collection_id is not None or deadline_within(settings.DEGRADE_SKIP_EXPANSION_SECONDS):
+        expanded_queries = [preprocessed_query]
+    else:
+        expander = QueryExpander()
+        expanded_queries = expander.expand_with_synonyms(query=preprocessed_query)
     all_results = []
     seen_docs = set()
     
-    # Use vector search for semantic queries
-    processor = SimplifiedUserGuideProcessor.get_instance()
-    
-    # Create search tasks for all expanded queries
+    # Create search tasks for all expanded queries, skipping the
+    # embedding step for the original query when it is already known
     search_tasks = [
-        processor.vectorstore.asimilarity_search_with_score(expanded_query, k=k)
+        vectorstore.asimilarity_search_with_score_by_vector(query_embedding, k=k)
+        if query_embedding is not None and expanded_query == preprocessed_query
+        else vectorstore.asimilarity_search_with_score(expanded_query, k=k)
         for expanded_query in expanded_queries
     ]
     
     # Execute all search tasks concurrently
-    results_list = await asyncio.gather(*search_tasks)
+    with trace_span("vector_db", searches=len(search_tasks)):
+        try:
+            results_list = await run_with_deadline(asyncio.gather(*search_tasks))
+        except ProgrammingError:
+            if collection_id is None:
+                raise
+            # Another worker may have dropped the collection since this one cached its store
+            store = CollectionStore.get_instance()
+            store.evict(collection_id)
+            if await store.get_vectorstore(collection_id) is None:
+                raise _collection_not_found(collection_id)
+            raise
     
     # Process all results
     for results in results_list:
         for doc, score in results:
-            # Use document content as the key for deduplication
-            doc_key = doc.page_content
+            # Use the stable document id as the key for deduplication
+            doc_key = doc.id or doc.page_content
             
             if doc_key not in seen_docs:
                 seen_docs.add(doc_key)
                 all_results.append(
                     {
+                        "id": doc.id,
                         "content": doc.page_content,
                         "metadata": doc.metadata,
                         "score": score
@@ -78,20 +166,42 @@ async def query_userguide_cosine_sim(query: str, k: int = 3):
     
     # Sort by score and limit to top k
     all_results.sort(key=lambda x: x['score'], reverse=True)
+    # The router's latency estimates are for the userguide legs it chooses between
+    if collection_id is None:
+        LegLatencyTracker.get_instance().record("vector", (time.perf_counter() - start) * 1000)
     return all_results[:k]
 
 
-@router.post("userguide/query/tfidf")
-async def query_with_tfidf(query: str, k: int = 3):
+@router.post("userguide/query/tfidf", dependencies=[Depends(admit("tfidf"))])
+async def query_with_tfidf(query: str, k: int = 3, rerank: bool = False, rerank_budget_ms: Optional[float] = None,
+        view: Literal["full", "snippet", "ids"] = "full", fields: Optional[str] = None, snippet_chars: int = 200,
+        collection_id: Optional[int] = None):
     """Query the userguide using TF-IDF retrieval"""
-    # For factual queries, TF-IDF works well
-    tfidf_processor = PersistentTFIDFProcessor.get_instance()
+    if collection_id is not None:
+        # Accepted only to be refused, so a collection search is not silently answered from the userguide
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="TF-IDF covers the userguide only; use vector, hybrid or enhanced search for collections"
+        )
     preprocessor = QueryPreprocessor()
     # Preprocess the query
     preprocessed_query = preprocessor.preprocess(query)    
-    results = tfidf_processor.search(preprocessed_query, k=k)
+    results = await _tfidf_search(preprocessed_query, _candidate_count(k, rerank))
+    results = await _maybe_rerank(query, results, k, rerank, rerank_budget_ms)
+    return shaped_response(results, query, view, fields, snippet_chars)
+
+
+async def _tfidf_search(preprocessed_query, k):
+    """TF-IDF search over an already preprocessed query"""
+    # For factual queries, TF-IDF works well
+    start = time.perf_counter()
+    tfidf_processor = PersistentTFIDFProcessor.get_instance()
+    with trace_span("tfidf", k=k):
+        results = tfidf_processor.search(preprocessed_query, k=k)
+    LegLatencyTracker.get_instance().record("tfidf", (time.perf_counter() - start) * 1000)
     return [
         {
+            "id": doc.id,
             "content": doc.page_content,
             "metadata": doc.metadata
         }
@@ -100,31 +210,185 @@ async def query_with_tfidf(query: str, k: int = 3):
 
 
 
-@router.post("userguide/query/hybrid")
-async def hybrid_search(query: str, k: int = 5):
+@router.post("userguide/query/hybrid", dependencies=[Depends(admit("hybrid"))])
+async def hybrid_search(query: str, k: int = 5, rerank: bool = False, rerank_budget_ms: Optional[float] = None,
+        view: Literal["full", "snippet", "ids"] = "full", fields: Optional[str] = None, snippet_chars: int = 200,
+        collection_id: Optional[int] = None):
     """Perform both TF-IDF and vector search, combining results"""
-    # For hybrid queries, combine methods
-    # TF-IDF results
-
     preprocessor = QueryPreprocessor()
     # Preprocess
     preprocessed_query = preprocessor.preprocess(query)
-    
-    tfidf_results = await query_with_tfidf(query=preprocessed_query,k=k)
+    results = await _hybrid_search(preprocessed_query, _candidate_count(k, rerank), collection_id=collection_id)
+    results = await _maybe_rerank(query, results, k, rerank, rerank_budget_ms)
+    return shaped_response(results, query, view, fields, snippet_chars)
+
+
+async def _hybrid_search(preprocessed_query, k, query_embedding=None, collection_id=None):
+    # For hybrid queries, combine methods
+    # TF-IDF results; the TF-IDF index only covers the userguide
+    tfidf_results = await _tfidf_search(preprocessed_query, k) if collection_id is None else []
     for res in tfidf_results:
         res["source"]="tfidf"
-    vector_results = await query_userguide_cosine_sim(query=preprocessed_query,k=k)
+    # Degrade to TF-IDF only when the deadline is too close for the vector leg
+    if collection_id is None and deadline_within(settings.DEGRADE_SKIP_VECTOR_SECONDS):
+        vector_results = []
+    else:
+        vector_results = await _vector_search(preprocessed_query, k, query_embedding, collection_id)
     for res in vector_results:
         res["source"]="vector"    
     
-    # Combine and deduplicate
+    return _merge_results(tfidf_results, vector_results, k)
+
+
+def _candidate_count(k, rerank):
+    """Number of candidates to retrieve; reranking needs a wider pool than k"""
+    return k * settings.RERANK_CANDIDATE_MULTIPLIER if rerank else k
+
+
+async def _maybe_rerank(query, results, k, rerank, budget_ms=None):
+    """Cross-encoder rerank of the retrieved candidates down to k, if requested"""
+    if not rerank:
+        return results[:k]
+    reranker = CrossEncoderReranker.get_instance()
+    with trace_span("rerank", candidates=len(results)):
+        return await reranker.rerank(query, results, k, budget_ms=budget_ms)
+
+
+def _merge_results(tfidf_results, vector_results, k):
+    """Combine TF-IDF and vector results, deduplicating on document id"""
+    if settings.HYBRID_FUSION == "rrf":
+        return _rrf_merge(tfidf_results, vector_results, k)
+
     all_results = []
-    seen_content = set()
+    seen_ids = set()
     
-    # Process TF-IDF results
-    for res in list(chain(tfidf_results,vector_results)):
-        if res["content"] not in seen_content:
-            seen_content.add(res["content"])
+    # TF-IDF results first, then vector results
+    for res in chain(tfidf_results,vector_results):
+        key = result_key(res)
+        if key not in seen_ids:
+            seen_ids.add(key)
             all_results.append(res)
     
     return all_results[:k]
+
+
+def _rrf_merge(tfidf_results, vector_results, k):
+    """Weighted reciprocal rank fusion of the two legs, deduplicating on document id"""
+    fused = {}
+    scores = {}
+    for results, weight in (
+        (tfidf_results, settings.HYBRID_TFIDF_WEIGHT),
+        (vector_results, settings.HYBRID_VECTOR_WEIGHT),
+    ):
+        for rank, res in enumerate(results, start=1):
+            key = result_key(res)
+            fused.setdefault(key, res)
+            scores[key] = scores.get(key, 0.0) + weight / (settings.RRF_K + rank)
+
+    ranked = sorted(fused, key=lambda key: scores[key], reverse=True)
+    return [fused[key] for key in ranked[:k]]
+
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def _format_event(event, payload, stream_format):
+    """Serialize a single stream event as an NDJSON line or an SSE frame"""
+    if stream_format == "sse":
+        return b"event: " + event.encode() + b"\ndata: " + dumps(payload) + b"\n\n"
+    return dumps({"event": event, **payload}) + b"\n"
+
+
+@router.post("userguide/query/stream")
+async def stream_search(request: Request, query: str, k: int = 5,
+        stream_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format"),
+        view: Literal["full", "snippet", "ids"] = "full", fields: Optional[str] = None, snippet_chars: int = 200,
+        collection_id: Optional[int] = None):
+    """
+    Hybrid search that streams each retrieval leg as soon as it completes.
+
+    Emits a `tfidf` and a `vector` event in completion order, followed by a
+    `fused` event holding the same ranking `hybrid_search` would return.
+    A leg failing after the stream has started (e.g. the deadline running
+    out, or a database error) ends it with an `error` event carrying the
+    status and detail.
+    With a collection_id only the `vector` leg runs, over that collection.
+    StreamingResponse only pulls the next event once the previous one has
+    been sent, so a slow client holds back the generator instead of
+    buffering results in memory.
+    """
+    # Admission is handled here rather than through a dependency so the slot
+    # is held until the stream finishes, not just until the response starts
+    start_deadline()
+    controller = AdmissionController.get_instance("stream")
+    await controller.acquire()
+    released = False
+
+    def release_slot():
+        # Called from the generator and as a background task; whichever runs first wins
+        nonlocal released
+        if not released:
+            released = True
+            controller.release()
+
+    try:
+        preprocessor = QueryPreprocessor()
+        preprocessed_query = preprocessor.preprocess(query)
+        if collection_id is not None:
+            # Unknown collections get a plain 404 before the stream starts
+            await _vectorstore_for(collection_id)
+    except Exception:
+        release_slot()
+        raise
+    # The TF-IDF index only covers the userguide, so collections only have a vector leg
+    skip_vector = collection_id is None and deadline_within(settings.DEGRADE_SKIP_VECTOR_SECONDS)
+
+    async def run_leg(source, search):
+        results = await search(preprocessed_query, k)
+        for res in results:
+            res["source"] = source
+        return source, results
+
+    async def event_stream():
+        legs = []
+        if collection_id is None:
+            legs.append(asyncio.create_task(run_leg("tfidf", _tfidf_search)))
+        if not skip_vector:
+            legs.append(asyncio.create_task(run_leg(
+                "vector", lambda q, n: _vector_search(q, n, collection_id=collection_id)
+            )))
+        leg_results = {"tfidf": [], "vector": []}
+        try:
+            for completed in asyncio.as_completed(legs):
+                source, results = await completed
+                leg_results[source] = results
+                if await request.is_disconnected():
+                    return
+                shaped = shape_results(results, query, view, fields, snippet_chars)
+                yield _format_event(source, {"results": shaped}, stream_format)
+
+            fused = _merge_results(leg_results["tfidf"], leg_results["vector"], k)
+            shaped = shape_results(fused, query, view, fields, snippet_chars)
+            yield _format_event("fused", {"results": shaped}, stream_format)
+        except HTTPException as e:
+            # The 200 and earlier events are already sent: report the failure in-band
+            yield _format_event("error", {"status": e.status_code, "detail": e.detail}, stream_format)
+        except Exception:
+            logger.exception("Stream search leg failed")
+            yield _format_event("error", {"status": 500, "detail": "Internal Server Error"}, stream_format)
+        finally:
+            # Client went away or a leg failed: don't leave searches running
+            for task in legs:
+                if not task.done():
+                    task.cancel()
+            release_slot()
+
+    # The background task covers a client that disconnects before the stream starts
+    return StreamingResponse(
+        event_stream(),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        background=BackgroundTask(release_slot)
+    )
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
+from uuid import UUID
 
 class DocumentBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=255)
@@ -20,3 +21,30 @@ class DocumentResponse(DocumentBase):
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1)
     top_k: int = Field(default=3, gt=0, le=10)
+
+class DocumentUpsert(DocumentBase):
+    # Derived from the collection, title and content when omitted
+    id: Optional[UUID] = None
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+class CollectionDocument(DocumentBase):
+    id: str
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+class BulkUpsertRequest(BaseModel):
+    documents: List[DocumentUpsert] = Field(..., min_length=1, max_length=1000)
+
+class BulkUpsertResponse(BaseModel):
+    ids: List[str]
+
+class CollectionCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = None
+
+class CollectionResponse(CollectionCreate):
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
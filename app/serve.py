@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Preload-then-fork server: loads the embedding model, TF-IDF index and NLTK
+corpora once, then forks uvicorn workers that share them copy-on-write.
+
+    python -m app.serve --workers 4 --port 8000
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from app.config import settings
+from app.main import app, check_postgres_running, start_postgres
+from app.preload import preload_artifacts
+from app.tracing import stop_logging
+
+logger = logging.getLogger(__name__)
+
+
+def bind_socket(host, port):
+    """Listening socket created before forking so every worker accepts on it"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock):
+    """Entry point of a forked worker; never returns"""
+    # The parent's handlers forward signals to workers, workers use uvicorn's own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, lifespan="on", log_config=None)
+    server = uvicorn.Server(config)
+    exit_code = 1
+    try:
+        server.run(sockets=[sock])
+        exit_code = 0 if server.started else 3
+    except Exception:
+        logger.exception(f"Worker pid={os.getpid()} failed")
+    finally:
+        # Queued records include e.g. uvicorn's startup-failure traceback
+        stop_logging()
+        os._exit(exit_code)
+
+
+def spawn_worker(sock):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(sock)
+    logger.info(f"Started worker pid={pid}")
+    return pid
+
+
+def serve(host, port, workers):
+    if not check_postgres_running():
+        if not start_postgres():
+            logger.critical("Could not start PostgreSQL server. Exiting...")
+            sys.exit(1)
+
+    preload_artifacts()
+    sock = bind_socket(host, port)
+    logger.info(f"Serving on http://{host}:{port} with {workers} workers")
+
+    # Start time of each worker, to tell a crash in service from a failure at startup
+    started = {spawn_worker(sock): time.monotonic() for _ in range(workers)}
+    pids = set(started)
+    early_failures = 0
+    exit_code = 0
+    shutting_down = False
+
+    def shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        pids.discard(pid)
+        if shutting_down:
+            continue
+
+        uptime = time.monotonic() - started.pop(pid)
+        if uptime >= settings.SERVE_EARLY_EXIT_SECONDS:
+            early_failures = 0
+            # Replacing a crashed worker is cheap: the artifacts are still in this process
+            logger.warning(f"Worker pid={pid} exited with status {status} after {uptime:.0f}s, restarting")
+        else:
+            # Failing at startup (e.g. database down) would fail again at once; back off, then give up
+            early_failures += 1
+            if early_failures >= settings.SERVE_MAX_EARLY_FAILURES:
+                logger.critical(f"{early_failures} workers in a row failed at startup. Exiting...")
+                shutdown(None, None)
+                exit_code = 1
+                continue
+            delay = settings.SERVE_RESPAWN_DELAY_SECONDS * 2 ** (early_failures - 1)
+            logger.warning(
+                f"Worker pid={pid} exited with status {status} {uptime:.1f}s after starting, "
+                f"restarting in {delay:.1f}s"
+            )
+            time.sleep(delay)
+            if shutting_down:
+                continue
+
+        pid = spawn_worker(sock)
+        started[pid] = time.monotonic()
+        pids.add(pid)
+
+    sock.close()
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the RAG API with preloaded, shared artifacts")
+    parser.add_argument("--host", default=settings.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVE_WORKERS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Off-loop structured logging and sampled per-request tracing.
+
+Log records are put on a bounded in-memory queue and written to the console
+and log file by a background thread, so a slow disk never blocks the event
+loop; when the queue is full, records are dropped and counted instead.
+Every request gets an id that is attached to all of its log records, and a
+sampled fraction of requests additionally logs a timed span per stage.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+trace_sampled_var = contextvars.ContextVar("trace_sampled", default=False)
+
+REQUEST_ID_HEADER = "x-request-id"
+FORCE_TRACE_HEADER = "x-trace"
+
+# Client-supplied request ids are echoed and logged, so only short plain ids are kept
+REQUEST_ID_PATTERN = re.compile(rb"[\w.-]{1,64}")
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+_queue_handler = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, including the request id and any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the id of the request being served, on the calling thread"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or erroring when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop waits for room in a full queue, so queued records are written first"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def _start_listener(log_queue, handlers):
+    global _listener
+    _listener = DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    """Write out every queued record and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_queue_status():
+    """Backlog and drop count of this process's log queue, or None before logging is configured"""
+    if _queue_handler is None:
+        return None
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "capacity": _queue_handler.queue.maxsize,
+        "dropped": _queue_handler.dropped,
+    }
+
+
+def stop_logging():
+    """Write out queued records and stop the writer thread; call before os._exit, which skips atexit"""
+    _stop_listener()
+
+
+def configure_logging(level="INFO", log_file="app.log", json_format=True, queue_size=10000):
+    """Route all logging through a bounded queue drained by a background thread"""
+    global _queue_handler
+    if json_format:
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    _queue_handler = queue_handler
+    root.setLevel(level)
+
+    _start_listener(log_queue, handlers)
+    # The writer is a daemon thread; without this, records logged just before exit are lost
+    atexit.register(_stop_listener)
+
+    # The listener thread does not survive fork (app.serve workers): stop it
+    # cleanly before forking and start a fresh one on each side afterwards
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(
+            before=_stop_listener,
+            after_in_parent=lambda: _start_listener(log_queue, handlers),
+            after_in_child=lambda: _start_listener(log_queue, handlers),
+        )
+    return queue_handler
+
+
+@contextmanager
+def trace_span(name, **fields):
+    """Time a stage of the current request; logs only if the request is sampled"""
+    if not trace_sampled_var.get():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logging.getLogger("app.trace").info(
+            f"span {name}",
+            extra={"span": name, "duration_ms": round((time.perf_counter() - start) * 1000, 3), **fields}
+        )
+
+
+class RequestTracingMiddleware:
+    """
+    ASGI middleware assigning each HTTP request an id (taken from the
+    X-Request-ID header if present) and deciding whether it is traced.
+    """
+
+    def __init__(self, app, sample_rate=0.0):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.logger = logging.getLogger("app.trace")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.encode(), b"")
+        if REQUEST_ID_PATTERN.fullmatch(request_id):
+            request_id = request_id.decode()
+        else:
+            request_id = uuid.uuid4().hex
+        sampled = headers.get(FORCE_TRACE_HEADER.encode()) == b"1" or random.random() < self.sample_rate
+        request_id_var.set(request_id)
+        trace_sampled_var.set(sampled)
+
+        start = time.perf_counter()
+        status = None
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if sampled:
+                self.logger.info(
+                    f"{scope['method']} {scope['path']} {status}",
+                    extra={
+                        "span": "request",
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    }
+                )
@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import logging
+import time
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.tracing import trace_span
+
+logger = logging.getLogger(__name__)
+
+# Absolute deadline (time.monotonic) of the request being served
+_request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+def start_deadline(seconds=None):
+    """Start the deadline clock for the current request"""
+    seconds = settings.REQUEST_DEADLINE_SECONDS if seconds is None else seconds
+    _request_deadline.set(time.monotonic() + seconds)
+
+
+def time_remaining():
+    """Seconds left before the current request's deadline, None if there is none"""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def deadline_within(seconds):
+    """True if the current request has less than `seconds` of budget left"""
+    remaining = time_remaining()
+    return remaining is not None and remaining < seconds
+
+
+def service_unavailable(detail):
+    """503 telling the client when to come back"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)}
+    )
+
+
+async def run_with_deadline(awaitable):
+    """Await a retrieval stage, failing with 503 if it would overrun the deadline"""
+    remaining = time_remaining()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        raise service_unavailable("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        raise service_unavailable("Request deadline exceeded")
+
+
+class AdmissionController:
+    """Bounded concurrency plus a bounded wait queue for one endpoint"""
+
+    _instances = {}
+
+    @classmethod
+    def get_instance(cls, endpoint):
+        """One controller per endpoint name"""
+        if endpoint not in cls._instances:
+            max_concurrency = settings.ADMISSION_ENDPOINT_LIMITS.get(
+                endpoint, settings.ADMISSION_MAX_CONCURRENCY
+            )
+            cls._instances[endpoint] = AdmissionController(
+                endpoint,
+                max_concurrency=max_concurrency,
+                max_queue=settings.ADMISSION_MAX_QUEUE,
+                queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT
+            )
+        return cls._instances[endpoint]
+
+    def __init__(self, endpoint, max_concurrency, max_queue, queue_timeout):
+        self.endpoint = endpoint
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self.shed_count = 0
+
+    def _shed(self, reason):
+        self.shed_count += 1
+        logger.warning(f"Shedding request on '{self.endpoint}': {reason}")
+        return service_unavailable(f"Server busy, {reason}")
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed; raises 503 when shed"""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            raise self._shed("wait queue full")
+
+        # Never wait past the request's own deadline
+        timeout = self.queue_timeout
+        remaining = time_remaining()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            raise self._shed("timed out waiting for a slot")
+        finally:
+            self._waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+
+def admit(endpoint):
+    """
+    FastAPI dependency enforcing admission control and starting the request
+    deadline. Use via `dependencies=[Depends(admit(...))]` so route functions
+    keep their signature when called directly from other routes.
+    """
+    async def dependency():
+        start_deadline()
+        controller = AdmissionController.get_instance(endpoint)
+        with trace_span("admission", endpoint=endpoint):
+            await controller.acquire()
+        try:
+            yield
+        finally:
+            controller.release()
+    return dependency
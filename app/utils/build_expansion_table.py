@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Script to mine the userguide corpus for query expansion terms.
+
+Each vocabulary term is paired with neighbours that are close to it in
+embedding space and that co-occur with it in the same sections. The result
+is written as a compact JSON lookup table that QueryExpander loads at startup.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from collections import Counter
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.config import settings
+from app.documents.csv_parser import CSVParser
+from app.utils.query_preprocessor import QueryPreprocessor
+
+
+def tokenize_documents(documents):
+    """Preprocessed token set of each section, same normalisation as queries"""
+    preprocessor = QueryPreprocessor()
+    return [set(preprocessor.preprocess(doc.page_content).split()) for doc in documents]
+
+
+def build_vocabulary(doc_tokens, min_df=2, max_vocab=5000):
+    """Most frequent terms that appear in at least min_df sections"""
+    doc_freq = Counter(term for tokens in doc_tokens for term in tokens)
+    vocab = [
+        term for term, df in doc_freq.most_common()
+        if df >= min_df and term.isalpha() and len(term) > 2
+    ]
+    return vocab[:max_vocab], doc_freq
+
+
+def cooccurrence_npmi(doc_tokens, vocab, doc_freq):
+    """Normalised PMI of term pairs co-occurring in a section, clipped to [0, 1]"""
+    vocab_set = set(vocab)
+    pair_freq = Counter()
+    for tokens in doc_tokens:
+        terms = sorted(tokens & vocab_set)
+        pair_freq.update(combinations(terms, 2))
+
+    n_docs = len(doc_tokens)
+    npmi = {}
+    for (a, b), count in pair_freq.items():
+        p_ab = count / n_docs
+        if p_ab >= 1.0:
+            continue
+        pmi = math.log(p_ab / ((doc_freq[a] / n_docs) * (doc_freq[b] / n_docs)))
+        score = max(0.0, pmi / -math.log(p_ab))
+        npmi[(a, b)] = npmi[(b, a)] = score
+    return npmi
+
+
+def embedding_similarities(vocab, model_name):
+    """Cosine similarity matrix of the vocabulary terms"""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, cache_folder=settings.MODEL_CACHE_DIR)
+    vectors = model.encode(vocab, batch_size=256, normalize_embeddings=True, show_progress_bar=True)
+    return np.asarray(vectors) @ np.asarray(vectors).T
+
+
+def build_expansion_table(
+    doc_tokens,
+    model_name,
+    min_df=2,
+    max_vocab=5000,
+    candidates=20,
+    max_neighbours=5,
+    embedding_weight=0.7,
+    min_score=0.3,
+):
+    """
+    Score neighbours as a weighted blend of embedding similarity and
+    co-occurrence NPMI, keeping the best max_neighbours above min_score.
+    """
+    vocab, doc_freq = build_vocabulary(doc_tokens, min_df=min_df, max_vocab=max_vocab)
+    npmi = cooccurrence_npmi(doc_tokens, vocab, doc_freq)
+    similarities = embedding_similarities(vocab, model_name)
+
+    table = {}
+    for i, term in enumerate(vocab):
+        # Embedding nearest neighbours, excluding the term itself
+        nearest = np.argsort(-similarities[i])[:candidates + 1]
+        scored = []
+        for j in nearest:
+            if j == i:
+                continue
+            neighbour = vocab[j]
+            score = (
+                embedding_weight * float(similarities[i, j])
+                + (1 - embedding_weight) * npmi.get((term, neighbour), 0.0)
+            )
+            if score >= min_score:
+                scored.append((neighbour, round(score, 4)))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        if scored:
+            table[term] = scored[:max_neighbours]
+    return table
+
+
+def main():
+    """Build the expansion table from the userguide CSV"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(project_root / "app" / "embeddings" / f"userguide_v{settings.CSV_VERSION}.csv"))
+    parser.add_argument("--output", default=settings.EXPANSION_TABLE_PATH)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--min-df", type=int, default=2)
+    parser.add_argument("--max-vocab", type=int, default=5000)
+    parser.add_argument("--max-neighbours", type=int, default=5)
+    parser.add_argument("--embedding-weight", type=float, default=0.7)
+    parser.add_argument("--min-score", type=float, default=0.3)
+    args = parser.parse_args()
+
+    documents = CSVParser()._load_documents_from_csv(args.csv)
+    print(f"Mining {len(documents)} sections from {args.csv}...")
+
+    table = build_expansion_table(
+        tokenize_documents(documents),
+        args.model,
+        min_df=args.min_df,
+        max_vocab=args.max_vocab,
+        max_neighbours=args.max_neighbours,
+        embedding_weight=args.embedding_weight,
+        min_score=args.min_score,
+    )
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"model": args.model, "terms": table}, f, separators=(",", ":"))
+
+    print(f"Wrote {len(table)} terms to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Script to fit the query router from a labelled query log.
+
+The log is JSON lines, one query per line:
+
+    {"query": "how do I install pgvector", "route": "tfidf"}
+    {"query": "...", "route": "vector", "quality": {"tfidf": 0.2, "vector": 0.9, "hybrid": 0.85}}
+
+`route` is the route that served the query best. `quality` optionally holds
+the measured quality of every route for that query (e.g. reciprocal rank of
+the relevant section). Without it, the labelled route scores 1 and the
+others 0. One centroid is fitted per label from the preprocessed-query
+embeddings, which are the same embeddings the router sees at query time.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.config import settings
+from app.utils.query_preprocessor import QueryPreprocessor
+from app.utils.query_router import ROUTES
+
+
+def load_query_log(path):
+    """Read labelled queries, skipping lines with an unknown route"""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get("route") not in ROUTES:
+                print(f"Skipping entry with unknown route: {line}")
+                continue
+            entries.append(entry)
+    return entries
+
+
+def fit_router(entries, model_name):
+    """Per-label centroid of normalised query embeddings and mean quality of each route"""
+    from sentence_transformers import SentenceTransformer
+
+    preprocessor = QueryPreprocessor()
+    model = SentenceTransformer(model_name, cache_folder=settings.MODEL_CACHE_DIR)
+    embeddings = model.encode(
+        [preprocessor.preprocess(entry["query"]) for entry in entries],
+        normalize_embeddings=True,
+        show_progress_bar=True
+    )
+
+    grouped = defaultdict(list)
+    for entry, embedding in zip(entries, embeddings):
+        grouped[entry["route"]].append((entry, embedding))
+
+    centroids = {}
+    quality = {}
+    for label, members in grouped.items():
+        centroid = np.mean([embedding for _, embedding in members], axis=0)
+        centroids[label] = (centroid / np.linalg.norm(centroid)).round(6).tolist()
+        quality[label] = {
+            route: float(np.mean([
+                entry.get("quality", {}).get(route, 1.0 if route == label else 0.0)
+                for entry, _ in members
+            ]))
+            for route in ROUTES
+        }
+    return centroids, quality
+
+
+def main():
+    """Fit router centroids from a labelled query log"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query_log", help="JSON lines file of labelled queries")
+    parser.add_argument("--output", default=settings.ROUTER_CENTROIDS_PATH)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    entries = load_query_log(args.query_log)
+    if not entries:
+        print(f"Error: no usable entries in {args.query_log}")
+        sys.exit(1)
+
+    centroids, quality = fit_router(entries, args.model)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"model": args.model, "centroids": centroids, "quality": quality}, f)
+
+    for label in centroids:
+        print(f"{label}: expected quality {quality[label]}")
+    print(f"Wrote router centroids for {len(centroids)} routes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
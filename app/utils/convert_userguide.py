@@ -1,167 +1,254 @@
 #!/usr/bin/env python3
 """
-Script to convert userguide_v1.md to CSV format for embedding in the RAG system.
+Script to convert markdown documents into token-bounded chunks for embedding in the RAG system.
+
+Takes any number of markdown files, directories or glob patterns, converts
+them in a process pool and writes the rows to CSV:
+
+    python app/utils/convert_userguide.py                        # userguide_v1.md -> userguide_v1.csv
+    python app/utils/convert_userguide.py docs/ "guides/**/*.md" --output all.csv --workers 4
+
+To skip the CSV, set USERGUIDE_SOURCES to the same inputs: the app then
+converts them with iter_rows at startup and builds both the TF-IDF index and
+the vector table from the rows.
 """
-import re
+import argparse
 import csv
+import glob
 import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.config import settings
+
+FIELDNAMES = ['headingTrace', 'pageTrace', 'page_id', 'section_id', 'chunk_index', 'content', 'enhancedContent']
+
+# Any heading level 1-4, matched once per line
+HEADING_PATTERN = re.compile(r'^(#{1,4}) (.+?)\s*$')
+
+# A word together with the whitespace that follows it, so chunks rejoin losslessly
+WORD_PATTERN = re.compile(r'\S+\s*')
+
+# Root of the pageTrace for known documents; others use a title made from the file name
+DOCUMENT_TITLES = {
+    "userguide_v1.md": "RAG System User Guide",
+}
+
+_tokenizer = None
+
+
+def _get_tokenizer(model_name=None):
+    """Tokenizer of the embedding model, loaded once per process"""
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        model_name = model_name or settings.EMBEDDING_MODEL
+        _tokenizer = AutoTokenizer.from_pretrained(
+            f"sentence-transformers/{model_name}",
+            cache_dir=settings.MODEL_CACHE_DIR
+        )
+    return _tokenizer
+
+
 def slugify(text):
     """Convert text to a URL-friendly format."""
     # Replace spaces with hyphens
     slug = text.lower().replace(' ', '-')
-    
+
     # Remove special characters
     slug = re.sub(r'[^a-z0-9-]', '', slug)
-    
+
     # Remove multiple hyphens
     slug = re.sub(r'-+', '-', slug)
-    
+
     return slug
 
 def clean_content(content):
     """Clean markdown content by removing code blocks and other formatting."""
     # Remove code blocks
     content = re.sub(r'```.*?```', '', content, flags=re.DOTALL)
-    
+
     # Remove HTML comments
     content = re.sub(r'<!--.*?-->', '', content, flags=re.DOTALL)
-    
+
     # Replace multiple newlines with a single newline
     content = re.sub(r'\n\s*\n', '\n\n', content)
-    
-    # Replace double quotes with two single quotes (CSV escape)
-    content = content.replace('"', '""')
-    
+
     return content.strip()
 
-def markdown_to_csv(input_path, output_path):
+def iter_sections(lines):
+    """Single pass over markdown lines, yielding (level, title, raw content) per heading."""
+    level, title, body = None, None, []
+    for line in lines:
+        match = HEADING_PATTERN.match(line)
+        if match:
+            if title is not None:
+                yield level, title, ''.join(body)
+            level, title, body = len(match.group(1)), match.group(2), []
+        elif title is not None:
+            body.append(line)
+    if title is not None:
+        yield level, title, ''.join(body)
+
+def chunk_text(text, max_tokens, overlap_tokens):
+    """
+    Split text into chunks of at most max_tokens embedding-model tokens, each
+    starting with roughly overlap_tokens from the end of the previous chunk.
+    Splits only on whitespace; a single word longer than max_tokens is kept whole.
     """
-    Convert a markdown file to CSV format with the following columns:
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return [text]
+
+    counts = [len(ids) for ids in _get_tokenizer()(words, add_special_tokens=False)["input_ids"]]
+    if sum(counts) <= max_tokens:
+        return [text]
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end, total = start, 0
+        while end < len(words) and (total + counts[end] <= max_tokens or end == start):
+            total += counts[end]
+            end += 1
+        chunks.append(''.join(words[start:end]).strip())
+        if end >= len(words):
+            break
+
+        # Step back over the tail of this chunk to start the next one, always moving forward
+        next_start, kept = end, 0
+        while next_start > start + 1 and kept + counts[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            kept += counts[next_start]
+        start = next_start
+    return chunks
+
+def convert_file(input_path, max_tokens=None, overlap_tokens=None, document_title=None):
+    """
+    Convert a markdown file into rows with the following columns:
     - headingTrace: The heading/title of the section
     - pageTrace: Hierarchical path showing document structure
     - page_id: URL-friendly identifier for the page
-    - section_id: Identifier for the section
+    - section_id: Identifier for the section, shared by all of its chunks
+    - chunk_index: Position of the chunk within its section
     - content: The main text content
     - enhancedContent: Enhanced version with additional context
     """
-    # Read the markdown file
-    with open(input_path, 'r', encoding='utf-8') as f:
-        md_content = f.read()
-    
-    # Regular expressions to match headings
-    h1_pattern = r'^# (.+?)$'
-    h2_pattern = r'^## (.+?)$'
-    h3_pattern = r'^### (.+?)$'
-    h4_pattern = r'^#### (.+?)$'
-    
-    # Find all headings with their positions
-    h1_matches = [(m.group(1), m.start()) for m in re.finditer(h1_pattern, md_content, re.MULTILINE)]
-    h2_matches = [(m.group(1), m.start()) for m in re.finditer(h2_pattern, md_content, re.MULTILINE)]
-    h3_matches = [(m.group(1), m.start()) for m in re.finditer(h3_pattern, md_content, re.MULTILINE)]
-    h4_matches = [(m.group(1), m.start()) for m in re.finditer(h4_pattern, md_content, re.MULTILINE)]
-    
-    # Combine all headings with their levels and positions
-    all_headings = [(1, title, pos) for title, pos in h1_matches]
-    all_headings.extend([(2, title, pos) for title, pos in h2_matches])
-    all_headings.extend([(3, title, pos) for title, pos in h3_matches])
-    all_headings.extend([(4, title, pos) for title, pos in h4_matches])
-    
-    # Sort by position in document
-    all_headings.sort(key=lambda x: x[2])
-    
-    # Extract content between headings
-    sections = []
-    for i in range(len(all_headings)):
-        level, title, start_pos = all_headings[i]
-        
-        # Find heading text start position (after the heading line)
-        heading_line_end = md_content.find("\n", start_pos) + 1
-        
-        # Find content end position (next heading or end of file)
-        if i < len(all_headings) - 1:
-            end_pos = all_headings[i+1][2]
-        else:
-            end_pos = len(md_content)
-        
-        # Extract content
-        content = md_content[heading_line_end:end_pos].strip()
-        
-        # Clean content
-        content = clean_content(content)
-        
-        sections.append((level, title, content, start_pos))
-    
-    # Generate CSV rows
-    csv_rows = []
-    document_title = "RAG System User Guide"  # Root title
+    input_path = Path(input_path)
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    document_title = document_title or DOCUMENT_TITLES.get(
+        input_path.name, input_path.stem.replace('_', ' ').replace('-', ' ').title()
+    )
+
+    rows = []
     current_path = [document_title, None, None, None, None]  # Track headings at each level (0-4)
-    
-    for level, title, content, _ in sections:
-        # Update current path (levels are 1-4, but array is 0-indexed)
-        current_path[level] = title
-        for i in range(level+1, 5):
-            if i < len(current_path):
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for level, title, raw_content in iter_sections(f):
+            # Update current path (levels are 1-4, but array is 0-indexed)
+            current_path[level] = title
+            for i in range(level+1, 5):
                 current_path[i] = None
-        
-        # Create page trace
-        page_trace_parts = []
-        for i in range(level+1):
-            if current_path[i] is not None:
-                page_trace_parts.append(current_path[i])
-        
-        page_trace = "<_dot_>".join(page_trace_parts)
-        
-        # Create IDs
-        section_id = slugify(title)
-        page_id = section_id
-        
-        # Create enhanced content with context
-        context_path = " > ".join(page_trace_parts[:-1]) if len(page_trace_parts) > 1 else ""
-        enhanced_content = f"This content is about '{title}'"
-        if context_path:
-            enhanced_content += f" within the section '{context_path}'"
-        enhanced_content += f". {content}"
-        
-        # Add to CSV rows
-        csv_rows.append({
-            'headingTrace': title,
-            'pageTrace': page_trace,
-            'page_id': page_id,
-            'section_id': section_id,
-            'content': content,
-            'enhancedContent': enhanced_content
-        })
-    
-    # Write to CSV
+
+            # Create page trace
+            page_trace_parts = [part for part in current_path[:level+1] if part is not None]
+            page_trace = "<_dot_>".join(page_trace_parts)
+
+            # Create IDs
+            section_id = slugify(title)
+            page_id = section_id
+
+            context_path = " > ".join(page_trace_parts[:-1]) if len(page_trace_parts) > 1 else ""
+            content = clean_content(raw_content)
+
+            for chunk_index, chunk in enumerate(chunk_text(content, max_tokens, overlap_tokens)):
+                # Create enhanced content with context
+                enhanced_content = f"This content is about '{title}'"
+                if context_path:
+                    enhanced_content += f" within the section '{context_path}'"
+                enhanced_content += f". {chunk}"
+
+                rows.append({
+                    'headingTrace': title,
+                    'pageTrace': page_trace,
+                    'page_id': page_id,
+                    'section_id': section_id,
+                    'chunk_index': chunk_index,
+                    'content': chunk,
+                    'enhancedContent': enhanced_content
+                })
+    return rows
+
+def expand_inputs(inputs):
+    """Resolve files, directories (searched recursively) and glob patterns to markdown files"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(Path(item).rglob("*.md")))
+        elif glob.has_magic(item):
+            paths.extend(Path(p) for p in sorted(glob.glob(item, recursive=True)))
+        else:
+            paths.append(Path(item))
+    # Keep the first occurrence of files matched by several inputs
+    return list(dict.fromkeys(paths))
+
+def iter_rows(paths, workers=None, max_tokens=None, overlap_tokens=None):
+    """Convert files in a process pool, yielding each file's rows as soon as it is done"""
+    if len(paths) == 1 or workers == 1:
+        for path in paths:
+            yield from convert_file(path, max_tokens, overlap_tokens)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_get_tokenizer) as executor:
+        for rows in executor.map(convert_file, paths, repeat(max_tokens), repeat(overlap_tokens)):
+            yield from rows
+
+def write_csv(rows, output_path):
+    """Write rows to CSV, returning how many were written"""
+    count = 0
     with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['headingTrace', 'pageTrace', 'page_id', 'section_id', 'content', 'enhancedContent']
-        writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, quoting=csv.QUOTE_ALL)
         writer.writeheader()
-        writer.writerows(csv_rows)
-    
-    return len(csv_rows)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+def markdown_to_csv(input_path, output_path):
+    """Convert a single markdown file to CSV, returning the number of rows"""
+    return write_csv(convert_file(input_path), output_path)
 
 def main():
-    """Convert the userguide markdown file to CSV format"""
-    # Define input and output paths
-    project_root = Path(__file__).parent.parent.parent
-    input_file = project_root / "app" / "embeddings" / "userguide_v1.md"
-    output_file = project_root / "app" / "embeddings" / "userguide_v1.csv"
-    
-    # Ensure the input file exists
-    if not input_file.exists():
-        print(f"Error: Input file {input_file} does not exist.")
+    """Convert markdown files to chunked rows, written to CSV"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "inputs", nargs="*",
+        default=[str(project_root / "app" / "embeddings" / "userguide_v1.md")],
+        help="Markdown files, directories or glob patterns"
+    )
+    parser.add_argument("--output", default=str(project_root / "app" / "embeddings" / "userguide_v1.csv"))
+    parser.add_argument("--workers", type=int, default=None, help="Processes used to convert files")
+    parser.add_argument("--max-tokens", type=int, default=settings.CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=settings.CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    paths = expand_inputs(args.inputs)
+    missing = [path for path in paths if not path.exists()]
+    if missing or not paths:
+        print(f"Error: no input files found or missing: {', '.join(map(str, missing))}")
         sys.exit(1)
-    
-    print(f"Converting {input_file} to {output_file}...")
-    
-    # Convert the markdown to CSV
-    section_count = markdown_to_csv(input_file, output_file)
-    
-    print(f"Conversion complete! Created {output_file} with {section_count} sections.")
+
+    print(f"Converting {len(paths)} markdown files...")
+    rows = iter_rows(paths, workers=args.workers, max_tokens=args.max_tokens, overlap_tokens=args.overlap)
+
+    count = write_csv(rows, args.output)
+    print(f"Conversion complete! Created {args.output} with {count} chunks.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Script to measure retrieval quality against latency for every search mode.
+
+A labelled query set is derived from the userguide headings: each heading
+becomes one or more questions whose relevant answer is that heading's
+section_id. Every combination of mode, k, query expansion, fusion weights
+and HNSW ef_search is run over the set, reporting recall@k and MRR next to
+p50/p99 latency. Configurations on the quality/latency Pareto front are
+marked as candidate operating points.
+
+Requires a populated userguide table (start the app once) and PostgreSQL:
+
+    python app/utils/evaluate_retrieval.py --k 3,5,10 --weights 1:1,2:1,1:2 --output eval.csv
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.config import settings
+from app.utils.convert_userguide import DOCUMENT_TITLES, iter_sections, slugify
+
+MODES = ("tfidf", "vector", "hybrid", "enhanced")
+
+QUESTION_TEMPLATES = (
+    "What is {title}?",
+    "How do I use {title}?",
+)
+
+
+def build_query_set(md_path, templates=QUESTION_TEMPLATES):
+    """(question, section_id) pairs derived from the headings of a markdown file"""
+    root_title = DOCUMENT_TITLES.get(Path(md_path).name)
+    queries = []
+    with open(md_path, 'r', encoding='utf-8') as f:
+        for _, title, _ in iter_sections(f):
+            if title == root_title:
+                continue
+            for template in templates:
+                queries.append((template.format(title=title.lower()), slugify(title)))
+    return queries
+
+
+def result_sections(result):
+    """Section ids a result answers for, including those of collapsed near duplicates"""
+    metadata = result.get("metadata", {})
+    sections = {metadata.get("section_id")}
+    sections.update(dup.get("section_id") for dup in metadata.get("duplicates", []))
+    return sections
+
+
+def reciprocal_rank(results, section_id):
+    for rank, result in enumerate(results, start=1):
+        if section_id in result_sections(result):
+            return 1.0 / rank
+    return 0.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(mode, query, k):
+    """Call the endpoint function for a mode, including serialization of its response"""
+    from app.routers import query as query_router
+
+    if mode == "tfidf":
+        response = await query_router.query_with_tfidf(query, k)
+    elif mode == "vector":
+        response = await query_router.query_userguide_cosine_sim(query, k)
+    elif mode == "hybrid":
+        response = await query_router.hybrid_search(query, k)
+    else:
+        response = await query_router.enhanced_search(query, k)
+    return json.loads(response.body)
+
+
+async def evaluate(queries, mode, k):
+    """Recall@k, MRR and latency percentiles of one configuration"""
+    latencies = []
+    reciprocal_ranks = []
+    for question, section_id in queries:
+        start = time.perf_counter()
+        results = await run_mode(mode, question, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        reciprocal_ranks.append(reciprocal_rank(results[:k], section_id))
+
+    return {
+        "recall_at_k": sum(rr > 0 for rr in reciprocal_ranks) / len(queries),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def mark_pareto(rows):
+    """Flag rows not beaten on both recall@k and p99 latency by another row"""
+    for row in rows:
+        row["pareto"] = not any(
+            other["recall_at_k"] >= row["recall_at_k"]
+            and other["p99_ms"] <= row["p99_ms"]
+            and (other["recall_at_k"] > row["recall_at_k"] or other["p99_ms"] < row["p99_ms"])
+            for other in rows
+        )
+    return rows
+
+
+def configurations(modes, ks, expansions, weights, ef_searches):
+    """Parameter grid; fusion weights only vary for modes that fuse both legs"""
+    for mode, k, expansion, ef_search in itertools.product(modes, ks, expansions, ef_searches):
+        mode_weights = weights if mode in ("hybrid", "enhanced") else [None]
+        for weight in mode_weights:
+            yield {"mode": mode, "k": k, "expansion": expansion, "weights": weight, "ef_search": ef_search}
+
+
+def apply_configuration(config, default_min_gain):
+    """Point the settings the query path reads at this configuration"""
+    settings.EXPANSION_MIN_GAIN = default_min_gain if config["expansion"] else float("inf")
+    if config["weights"] is None:
+        settings.HYBRID_FUSION = "concat"
+    else:
+        settings.HYBRID_FUSION = "rrf"
+        settings.HYBRID_TFIDF_WEIGHT, settings.HYBRID_VECTOR_WEIGHT = config["weights"]
+
+
+async def initialise(build_index):
+    """Load the same resources the app loads at startup"""
+    from app.documents.tfidf_processor import PersistentTFIDFProcessor
+    from app.documents.userguide_processor import SimplifiedUserGuideProcessor
+    from app.preload import download_nltk_data
+    from app.utils.query_expander import QueryExpander
+
+    download_nltk_data()
+    PersistentTFIDFProcessor.get_instance().initialize()
+    QueryExpander.load_expansion_table()
+    processor = SimplifiedUserGuideProcessor.get_instance()
+    await processor.attach_vectorstore()
+    if build_index:
+        from langchain_postgres.v2.indexes import HNSWIndex
+        await processor.vectorstore.aapply_vector_index(HNSWIndex())
+
+
+async def sweep(queries, configs, warmup):
+    from langchain_postgres.v2.indexes import HNSWQueryOptions
+    from app.documents.userguide_processor import SimplifiedUserGuideProcessor
+
+    processor = SimplifiedUserGuideProcessor.get_instance()
+    default_min_gain = settings.EXPANSION_MIN_GAIN
+    rows = []
+    current_ef_search = None
+    for config in configs:
+        if config["ef_search"] != current_ef_search:
+            options = HNSWQueryOptions(ef_search=config["ef_search"]) if config["ef_search"] else None
+            await processor.attach_vectorstore(index_query_options=options)
+            current_ef_search = config["ef_search"]
+        apply_configuration(config, default_min_gain)
+
+        # Untimed pass so model and cache warm-up does not land in the first configuration
+        await evaluate(queries[:warmup], config["mode"], config["k"])
+        metrics = await evaluate(queries, config["mode"], config["k"])
+        row = {**config, **metrics}
+        row["weights"] = "" if config["weights"] is None else f"{config['weights'][0]}:{config['weights'][1]}"
+        rows.append(row)
+        print(
+            f"{row['mode']:<9} k={row['k']:<3} expansion={row['expansion']!s:<5} "
+            f"weights={row['weights'] or '-':<7} ef_search={row['ef_search'] or '-':<5} "
+            f"recall@k={row['recall_at_k']:.3f} mrr={row['mrr']:.3f} "
+            f"p50={row['p50_ms']:.1f}ms p99={row['p99_ms']:.1f}ms"
+        )
+    return mark_pareto(rows)
+
+
+def print_table(rows):
+    print("\nPareto operating points (recall@k vs p99 latency):")
+    print(f"{'mode':<9} {'k':>3} {'exp':<5} {'weights':<7} {'ef':>5} {'recall@k':>9} {'mrr':>6} {'p50ms':>8} {'p99ms':>8}")
+    for row in sorted((r for r in rows if r["pareto"]), key=lambda r: r["p99_ms"]):
+        print(
+            f"{row['mode']:<9} {row['k']:>3} {row['expansion']!s:<5} {row['weights'] or '-':<7} "
+            f"{row['ef_search'] or '-':>5} {row['recall_at_k']:>9.3f} {row['mrr']:>6.3f} "
+            f"{row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+        )
+
+
+def parse_list(value, cast):
+    return [cast(item) for item in value.split(",") if item]
+
+
+def parse_weights(value):
+    return [tuple(float(w) for w in pair.split(":")) for pair in value.split(",") if pair]
+
+
+async def run(args):
+    from app.db import engine
+
+    queries = build_query_set(args.markdown)
+    print(f"Evaluating {len(queries)} heading-derived queries from {args.markdown}")
+    configs = list(configurations(
+        parse_list(args.modes, str),
+        parse_list(args.k, int),
+        [True, False] if args.sweep_expansion else [True],
+        [None] + parse_weights(args.weights) if args.weights else [None],
+        parse_list(args.ef_search, int) if args.ef_search else [None],
+    ))
+    try:
+        await initialise(args.build_index)
+        return await sweep(queries, configs, args.warmup)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    """Run the evaluation sweep and print the Pareto table"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markdown", default=str(project_root / "app" / "embeddings" / "userguide_v1.md"))
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--k", default="3,5,10")
+    parser.add_argument("--no-expansion-sweep", dest="sweep_expansion", action="store_false",
+                        help="Only evaluate with query expansion on")
+    parser.add_argument("--weights", default="1:1,2:1,1:2",
+                        help="TF-IDF:vector RRF weights to sweep for hybrid modes, besides plain concatenation")
+    parser.add_argument("--ef-search", default="",
+                        help="HNSW ef_search values to sweep; needs an HNSW index (see --build-index)")
+    parser.add_argument("--build-index", action="store_true", help="Create an HNSW index on the userguide table first")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed queries before each configuration")
+    parser.add_argument("--output", help="Also write every configuration to this CSV file")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nWrote {len(rows)} configurations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
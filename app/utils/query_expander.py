@@ -2,41 +2,108 @@ from sentence_transformers import SentenceTransformer, util
 from langchain_postgres import PGVectorStore
 import torch
 import asyncio
+import json
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hand-written expansions, used only until a corpus-derived table has been
+# built with app/utils/build_expansion_table.py
+DEFAULT_TERM_EXPANSIONS = {
+    "api": ["endpoint", "rest", "request", "response", "http"],
+    "authentication": ["auth", "login", "credentials", "token", "api key"],
+    "database": ["pgvector", "postgresql", "sql", "vector", "index"],
+    "embedding": ["vector", "encoding", "representation", "similarity"],
+    "setup": ["installation", "configuration", "initialize", "configure"],
+    "document": ["content", "text", "file", "csv", "pdf"]
+}
 
 class QueryExpander:
+    # term -> [(neighbour, confidence), ...], shared by all instances
+    _expansion_table = None
+
+    @classmethod
+    def load_expansion_table(cls, path=None):
+        """Load the precomputed expansion table into memory, falling back to the default dict"""
+        path = path or settings.EXPANSION_TABLE_PATH
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            cls._expansion_table = {
+                term: [(neighbour, score) for neighbour, score in neighbours]
+                for term, neighbours in data["terms"].items()
+            }
+            logger.info(f"Loaded expansion table with {len(cls._expansion_table)} terms from {path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Expansion table unavailable ({e}), using default term expansions")
+            cls._expansion_table = {
+                term: [(neighbour, 1.0) for neighbour in neighbours]
+                for term, neighbours in DEFAULT_TERM_EXPANSIONS.items()
+            }
+        return cls._expansion_table
+
     def __init__(self, model_name="all-mpnet-base-v2"):
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self._model = None
         
-        # Dictionary of domain-specific term expansions
-        # This can be extended with domain-specific terminology
-        self.term_expansions = {
-            "api": ["endpoint", "rest", "request", "response", "http"],
-            "authentication": ["auth", "login", "credentials", "token", "api key"],
-            "database": ["pgvector", "postgresql", "sql", "vector", "index"],
-            "embedding": ["vector", "encoding", "representation", "similarity"],
-            "setup": ["installation", "configuration", "initialize", "configure"],
-            "document": ["content", "text", "file", "csv", "pdf"]
-        }
+        if QueryExpander._expansion_table is None:
+            QueryExpander.load_expansion_table()
+        self.term_expansions = QueryExpander._expansion_table
         
-    def expand_with_synonyms(self, query, max_expansions=2):
-        """Expand query with domain-specific synonyms"""
+    @property
+    def model(self):
+        """Embedding model, loaded on first use and shared with the vector store when possible"""
+        if self._model is None:
+            from app.documents import SimplifiedUserGuideProcessor
+            processor = SimplifiedUserGuideProcessor.get_instance()
+            if processor.model_name == self.model_name:
+                # Reuse the weights already loaded for the vector store
+                self._model = processor.embeddings.client
+            else:
+                self._model = SentenceTransformer(self.model_name, cache_folder=settings.MODEL_CACHE_DIR)
+        return self._model
+
+    def expand_with_scores(self, query, max_expansions=2):
+        """
+        Look up expansion terms for each query term, with their confidence.
+        A neighbour shared by several query terms is listed once, with its best confidence.
+        """
         query_terms = query.lower().split()
-        expansions = []
+        expansions = {}
         
         for term in query_terms:
-            if term in self.term_expansions:
-                # Add up to max_expansions related terms
-                expansions.extend(self.term_expansions[term][:max_expansions])
+            for neighbour, score in self.term_expansions.get(term, [])[:max_expansions]:
+                # Add up to max_expansions related terms not already in the query
+                if neighbour not in query_terms:
+                    expansions[neighbour] = max(score, expansions.get(neighbour, score))
+        
+        return list(expansions.items())
+
+    def expand_with_synonyms(self, query, max_expansions=2, min_gain=None):
+        """
+        Expand query with corpus-derived related terms.
+
+        The expanded query costs a second vector search, so it is only added
+        when the mean confidence of its terms reaches `min_gain`.
+        """
+        min_gain = settings.EXPANSION_MIN_GAIN if min_gain is None else min_gain
+        expansions = self.expand_with_scores(query, max_expansions=max_expansions)
         
         # Return original query if no expansions found
         if not expansions:
             return [query]
         
+        expected_gain = sum(score for _, score in expansions) / len(expansions)
+        if expected_gain < min_gain:
+            return [query]
+        
         # Create expanded query versions
         expanded_queries = [query]  # Always keep the original query
         
         # Add original query + expansions
-        expanded_query = f"{query} {' '.join(expansions)}"
+        expanded_query = f"{query} {' '.join(term for term, _ in expansions)}"
         expanded_queries.append(expanded_query)
         
         return expanded_queries
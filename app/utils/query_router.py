@@ -0,0 +1,131 @@
+import json
+import logging
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ROUTES = ("tfidf", "vector", "hybrid")
+
+# Which retrieval legs each route runs; hybrid runs them one after the other
+ROUTE_LEGS = {
+    "tfidf": ("tfidf",),
+    "vector": ("vector",),
+    "hybrid": ("tfidf", "vector"),
+}
+
+
+class LegLatencyTracker:
+    """Exponentially weighted moving average of each retrieval leg's latency"""
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Singleton pattern to ensure only one instance exists"""
+        if cls._instance is None:
+            cls._instance = LegLatencyTracker()
+        return cls._instance
+
+    def __init__(self, alpha=None):
+        self.alpha = settings.ROUTER_LATENCY_ALPHA if alpha is None else alpha
+        self.latency_ms = dict(settings.ROUTER_LATENCY_PRIORS_MS)
+
+    def record(self, leg, elapsed_ms):
+        previous = self.latency_ms.get(leg, elapsed_ms)
+        self.latency_ms[leg] = (1 - self.alpha) * previous + self.alpha * elapsed_ms
+
+    def route_latency(self, route):
+        return sum(self.latency_ms[leg] for leg in ROUTE_LEGS[route])
+
+
+class QueryRouter:
+    """
+    Picks a retrieval route from the query embedding.
+
+    The embedding is compared against route centroids fitted offline by
+    app/utils/calibrate_router.py. Each centroid carries the quality every
+    route achieved on the queries it was fitted from, so the router can
+    estimate a route's expected quality. Among the routes whose expected
+    quality is close to the best, it takes the one with the most quality
+    per millisecond of observed latency.
+    """
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Singleton pattern to ensure only one instance exists"""
+        if cls._instance is None:
+            cls._instance = QueryRouter()
+            cls._instance.load()
+        return cls._instance
+
+    def __init__(self):
+        self.labels = []
+        self.centroids = None  # (n_labels, dim), L2-normalised
+        self.quality = None  # (n_labels, len(ROUTES))
+        self.latency = LegLatencyTracker.get_instance()
+
+    @property
+    def is_calibrated(self):
+        return self.centroids is not None
+
+    def load(self, path=None):
+        """
+        Load fitted centroids; the router stays uncalibrated if none exist, the
+        file is malformed, or they were fitted with a different embedding size
+        """
+        path = path or settings.ROUTER_CENTROIDS_PATH
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            labels = list(data["centroids"])
+            centroids = np.asarray([data["centroids"][label] for label in labels], dtype=np.float32)
+            quality = np.asarray(
+                [[data["quality"][label].get(route, 0.0) for route in ROUTES] for label in labels],
+                dtype=np.float32
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Query router centroids unavailable ({e}), using keyword classifier")
+            return False
+
+        if centroids.ndim != 2 or centroids.shape[1] != settings.VECTOR_SIZE:
+            logger.warning(
+                f"Query router centroids in {path} have shape {centroids.shape}, expected "
+                f"(n, {settings.VECTOR_SIZE}); re-run calibrate_router. Using keyword classifier"
+            )
+            return False
+
+        self.labels = labels
+        self.centroids = centroids
+        self.quality = quality
+        logger.info(f"Loaded query router with {len(self.labels)} centroids from {path}")
+        return True
+
+    def expected_quality(self, query_embedding):
+        """Expected quality of each route, weighting centroids by similarity to the query"""
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        similarities = self.centroids @ vector
+        temperature = max(settings.ROUTER_TEMPERATURE, 1e-6)
+        weights = np.exp((similarities - similarities.max()) / temperature)
+        weights /= weights.sum()
+        return dict(zip(ROUTES, (weights @ self.quality).tolist()))
+
+    def route(self, query_embedding):
+        """Return the route with the best quality per millisecond among near-best routes"""
+        quality = self.expected_quality(query_embedding)
+        best_quality = max(quality.values())
+
+        candidates = [
+            route for route in ROUTES
+            if quality[route] >= best_quality - settings.ROUTER_QUALITY_TOLERANCE
+        ]
+        return max(
+            candidates,
+            key=lambda route: quality[route] / max(self.latency.route_latency(route), 1e-3)
+        )
+
@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+from sentence_transformers import CrossEncoder
+
+from app.config import settings
+from app.utils.admission import time_remaining
+from app.utils.response_shaping import result_key
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class CrossEncoderReranker:
+    """
+    Second-stage reranker with a per-request latency budget.
+
+    Candidates with a cached score are ranked for free. The rest are scored
+    in batches until the budget runs out; whatever is left unscored keeps
+    its retrieval order behind the scored candidates.
+    """
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Singleton pattern to ensure only one instance exists"""
+        if cls._instance is None:
+            cls._instance = CrossEncoderReranker()
+        return cls._instance
+
+    def __init__(self, model_name=None, cache_size=None):
+        self.model_name = model_name or settings.RERANK_MODEL
+        self.cache_size = settings.RERANK_CACHE_SIZE if cache_size is None else cache_size
+        self._model = None
+        # (query hash, document id, else content) -> score, least recently used first
+        self._cache = OrderedDict()
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = CrossEncoder(self.model_name, cache_folder=settings.MODEL_CACHE_DIR)
+        return self._model
+
+    def _cache_get(self, key):
+        score = self._cache.get(key)
+        if score is not None:
+            self._cache.move_to_end(key)
+        return score
+
+    def _cache_put(self, key, score):
+        self._cache[key] = score
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def rerank(self, query, results, k, budget_ms=None, batch_size=None):
+        """Reorder retrieval results by cross-encoder score, spending at most budget_ms"""
+        budget_ms = settings.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        batch_size = batch_size or settings.RERANK_BATCH_SIZE
+
+        # Never spend past the request deadline
+        remaining = time_remaining()
+        if remaining is not None:
+            budget_ms = min(budget_ms, remaining * 1000)
+        deadline = time.perf_counter() + budget_ms / 1000
+
+        query_key = _hash(query)
+        keys = [(query_key, result_key(res)) for res in results]
+        scores = {}
+        pending = []
+        for i, key in enumerate(keys):
+            score = self._cache_get(key)
+            if score is None:
+                pending.append(i)
+            else:
+                scores[i] = score
+
+        for start in range(0, len(pending), batch_size):
+            if time.perf_counter() >= deadline:
+                logger.debug(f"Rerank budget spent, {len(pending) - start} candidates left unscored")
+                break
+            batch = pending[start:start + batch_size]
+            pairs = [(query, results[i]["content"]) for i in batch]
+            # Scoring is CPU-bound, and the first call loads (maybe downloads) the model; keep both off the event loop
+            batch_scores = await asyncio.to_thread(lambda: self.model.predict(pairs))
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self._cache_put(keys[i], float(score))
+
+        scored = sorted(scores, key=lambda i: scores[i], reverse=True)
+        unscored = [i for i in range(len(results)) if i not in scores]
+
+        ranked = []
+        for i in scored[:k]:
+            results[i]["rerank_score"] = scores[i]
+            ranked.append(results[i])
+        ranked.extend(results[i] for i in unscored[:k - len(ranked)])
+        return ranked
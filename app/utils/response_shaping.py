@@ -0,0 +1,93 @@
+"""
+Shaping of search results into compact response payloads.
+"""
+
+import json
+import re
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+VIEWS = ("full", "snippet", "ids")
+
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+else:
+    FastJSONResponse = JSONResponse
+
+    def dumps(obj):
+        return json.dumps(obj, default=str).encode('utf-8')
+
+
+def result_key(result):
+    """Stable key for deduplicating a result across legs: its document id, else its text"""
+    return result.get("id") or result["content"]
+
+
+def make_snippet(content, query, width=200):
+    """Window of about `width` characters around the first query term found in content"""
+    if len(content) <= width:
+        return content
+
+    terms = [re.escape(term) for term in query.lower().split() if len(term) > 2]
+    match = re.search("|".join(terms), content, re.IGNORECASE) if terms else None
+    centre = match.start() if match else 0
+
+    start = max(0, min(centre - width // 2, len(content) - width))
+    end = start + width
+    snippet = content[start:end].strip()
+    if start > 0:
+        snippet = "..." + snippet
+    if end < len(content):
+        snippet = snippet + "..."
+    return snippet
+
+
+def _project(result, fields):
+    """Keep only the requested fields; `metadata.<key>` selects single metadata keys"""
+    projected = {}
+    for field in fields:
+        if field.startswith("metadata."):
+            key = field.split(".", 1)[1]
+            if key in result.get("metadata", {}):
+                projected.setdefault("metadata", {})[key] = result["metadata"][key]
+        elif field in result:
+            projected[field] = result[field]
+    return projected
+
+
+def shape_results(results, query, view="full", fields=None, snippet_chars=200):
+    """
+    Reduce results to what the caller asked for:
+    - view "full": everything retrieved
+    - view "snippet": `content` replaced by a `snippet` around the matched terms
+    - view "ids": just the document ids
+    `fields` is a comma separated projection applied to the full and snippet views.
+    """
+    if view == "ids":
+        return [result.get("id") for result in results]
+
+    shaped = []
+    for result in results:
+        if view == "snippet":
+            result = dict(result)
+            result["snippet"] = make_snippet(result.pop("content"), query, snippet_chars)
+        shaped.append(result)
+
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        shaped = [_project(result, selected) for result in shaped]
+    return shaped
+
+
+def shaped_response(results, query, view="full", fields=None, snippet_chars=200):
+    """Shaped results serialized directly, skipping FastAPI's generic encoder"""
+    return FastJSONResponse(content=shape_results(results, query, view, fields, snippet_chars))
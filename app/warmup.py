@@ -0,0 +1,171 @@
+"""
+Warm-up of every hot path before a replica takes traffic.
+
+The userguide table and its indexes are loaded into Postgres shared buffers
+with pg_prewarm, the lemmatizer, embedding model and cross-encoder are run
+once, and then rounds of synthetic queries go through every retrieval mode
+until the mean latency of a round is within WARMUP_STEADY_TOLERANCE of the
+previous round's. /readyz reports ready only after that; if warm-up fails
+(e.g. the database or a model is unavailable) it is retried and the
+replica stays unready meanwhile.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODES = ("tfidf", "vector", "hybrid", "enhanced")
+
+
+class WarmupStatus:
+    """Warm-up progress of this process, reported by /readyz"""
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Singleton pattern to ensure only one instance exists"""
+        if cls._instance is None:
+            cls._instance = WarmupStatus()
+        return cls._instance
+
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.round_means_ms = []
+        self.error = None
+
+    def mark_ready(self):
+        self.ready = True
+
+    def as_dict(self):
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "rounds": len(self.round_means_ms),
+            "round_means_ms": [round(ms, 1) for ms in self.round_means_ms],
+            "error": self.error,
+        }
+
+
+def is_steady(round_means, tolerance):
+    """True once the last two rounds' mean latencies differ by at most `tolerance` (relative)"""
+    if len(round_means) < 2:
+        return False
+    previous, last = round_means[-2], round_means[-1]
+    return abs(last - previous) <= tolerance * previous
+
+
+async def prewarm_tables():
+    """Load the userguide table and its indexes into shared buffers; returns blocks read"""
+    from app.db import engine
+
+    relation = f'"{settings.USERGUIDE_SCHEMA}"."{settings.USERGUIDE_TABLE}"'
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_prewarm"))
+        indexes = (await conn.execute(
+            text("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = CAST(:relation AS regclass)"),
+            {"relation": relation}
+        )).scalars().all()
+        blocks = 0
+        for name in [relation, *indexes]:
+            result = await conn.execute(text("SELECT pg_prewarm(CAST(:name AS regclass))"), {"name": name})
+            blocks += result.scalar()
+    return blocks
+
+
+async def prime_models():
+    """Run each model once so weights are paged in and lazy loaders have fired"""
+    from nltk.stem import WordNetLemmatizer
+    from app.documents.userguide_processor import SimplifiedUserGuideProcessor
+
+    # wordnet is only read on the first lemmatize call
+    WordNetLemmatizer().lemmatize("warm")
+    processor = SimplifiedUserGuideProcessor.get_instance()
+    await processor.embeddings.aembed_query("warm up")
+
+    if settings.WARMUP_RERANK:
+        from app.utils.reranker import CrossEncoderReranker
+
+        reranker = CrossEncoderReranker.get_instance()
+        # Loading the cross-encoder blocks; keep it off the event loop so /healthz stays live
+        await asyncio.to_thread(lambda: reranker.model.predict([("warm up", "warm up")]))
+
+
+async def _run_query(mode, query):
+    from app.routers import query as query_router
+
+    if mode == "tfidf":
+        await query_router.query_with_tfidf(query)
+    elif mode == "vector":
+        await query_router.query_userguide_cosine_sim(query)
+    elif mode == "hybrid":
+        await query_router.hybrid_search(query)
+    else:
+        await query_router.enhanced_search(query)
+
+
+async def run_round(queries):
+    """Mean latency in ms of every query through every mode"""
+    latencies = []
+    for query in queries:
+        for mode in MODES:
+            start = time.perf_counter()
+            await _run_query(mode, query)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(latencies)
+
+
+async def _warm_up(status):
+    """One warm-up attempt; raises if a hot path fails"""
+    if settings.WARMUP_PREWARM:
+        # Cold buffers are only slower, so a missing extension or privilege is not fatal
+        try:
+            blocks = await prewarm_tables()
+            logger.info(f"pg_prewarm loaded {blocks} blocks of {settings.USERGUIDE_TABLE} and its indexes")
+        except Exception as e:
+            logger.warning(f"pg_prewarm unavailable, skipping: {e}")
+
+    await prime_models()
+
+    if settings.WARMUP_QUERIES:
+        for _ in range(settings.WARMUP_MAX_ROUNDS):
+            status.round_means_ms.append(await run_round(settings.WARMUP_QUERIES))
+            if is_steady(status.round_means_ms, settings.WARMUP_STEADY_TOLERANCE):
+                break
+        else:
+            logger.warning(f"Latency not steady after {settings.WARMUP_MAX_ROUNDS} warm-up rounds")
+
+
+async def run_warmup():
+    """
+    Warm up, then mark the process ready. A failed attempt is logged and
+    reported by /readyz, and retried after WARMUP_RETRY_SECONDS; the process
+    is only marked ready once an attempt succeeds.
+    """
+    status = WarmupStatus.get_instance()
+    start = time.perf_counter()
+    while True:
+        status.attempts += 1
+        status.round_means_ms = []
+        try:
+            await _warm_up(status)
+            break
+        except Exception as e:
+            status.error = str(e)
+            logger.exception(f"Warm-up attempt {status.attempts} failed, retrying in {settings.WARMUP_RETRY_SECONDS}s")
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+
+    status.error = None
+    status.mark_ready()
+    logger.info(
+        f"Warm-up finished in {time.perf_counter() - start:.1f}s, "
+        f"round means (ms): {status.as_dict()['round_means_ms']}"
+    )
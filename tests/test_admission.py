@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.utils.admission import (
+    AdmissionController,
+    deadline_within,
+    run_with_deadline,
+    start_deadline,
+)
+
+
+@pytest.mark.asyncio
+async def test_admission_sheds_when_queue_full():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=0, queue_timeout=1.0)
+    await controller.acquire()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await controller.acquire()
+
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "Retry-After" in exc_info.value.headers
+    controller.release()
+
+
+@pytest.mark.asyncio
+async def test_admission_queued_request_gets_slot_on_release():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=1.0)
+    await controller.acquire()
+
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    controller.release()
+    await waiter
+
+    controller.release()
+    assert controller.shed_count == 0
+
+
+@pytest.mark.asyncio
+async def test_deadline_exceeded_returns_503():
+    start_deadline(0.01)
+    assert deadline_within(1.0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await run_with_deadline(asyncio.sleep(1))
+
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
@@ -0,0 +1,73 @@
+import pytest
+from pydantic import ValidationError
+
+from app.documents.collection_store import document_id
+from app.models.document import Collection
+from app.schemas.document import BulkUpsertRequest
+
+
+def test_document_id_is_stable_and_scoped_to_collection():
+    assert document_id(1, "Webhooks", "Retries") == document_id(1, "Webhooks", "Retries")
+    assert document_id(1, "Webhooks", "Retries") != document_id(2, "Webhooks", "Retries")
+    assert document_id(1, "Webhooks", "Retries") != document_id(1, "Webhooks", "Retries twice")
+
+
+def test_each_collection_has_its_own_table():
+    assert Collection(id=7, name="notes").table_name == "collection_7"
+
+
+def test_bulk_upsert_requires_documents():
+    with pytest.raises(ValidationError):
+        BulkUpsertRequest(documents=[])
+
+    request = BulkUpsertRequest(documents=[{"title": "v2.1", "content": "Adds webhook retries."}])
+    assert request.documents[0].id is None
+    assert request.documents[0].metadata == {}
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.queries = []
+
+    async def asimilarity_search_with_score(self, query, k):
+        from langchain_core.documents import Document
+
+        self.queries.append(query)
+        return [(Document(id="d1", page_content="Adds webhook retries.", metadata={"title": "v2.1"}), 0.1)]
+
+
+def test_collection_search_skips_userguide_expansion_and_latency(monkeypatch):
+    import asyncio
+
+    from app.routers import query
+    from app.utils.query_expander import QueryExpander
+    from app.utils.query_router import LegLatencyTracker
+
+    store = FakeVectorStore()
+
+    async def get_vectorstore(self, collection_id):
+        return store
+
+    def fail(*args, **kwargs):
+        raise AssertionError("userguide-only machinery used for a collection search")
+
+    monkeypatch.setattr(query.CollectionStore, "get_vectorstore", get_vectorstore)
+    monkeypatch.setattr(QueryExpander, "expand_with_synonyms", fail)
+    monkeypatch.setattr(LegLatencyTracker, "record", fail)
+
+    results = asyncio.run(query._vector_search("webhook retry", 3, collection_id=1))
+
+    assert store.queries == ["webhook retry"]
+    assert [r["id"] for r in results] == ["d1"]
+
+
+def test_tfidf_search_rejects_collection_id():
+    import asyncio
+
+    from fastapi import HTTPException
+
+    from app.routers import query
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(query.query_with_tfidf("webhook retry", collection_id=1))
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,39 @@
+import pytest
+
+from app.utils import convert_userguide
+
+
+class WordTokenizer:
+    """One token per word, so chunk sizes are easy to reason about"""
+
+    def __call__(self, words, add_special_tokens=False):
+        return {"input_ids": [[0] for _ in words]}
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    monkeypatch.setattr(convert_userguide, "_tokenizer", WordTokenizer())
+
+
+def test_iter_sections_single_pass():
+    lines = ["intro\n", "# Title\n", "body\n", "## Sub\n", "more\n", "text\n"]
+    sections = list(convert_userguide.iter_sections(lines))
+    assert sections == [(1, "Title", "body\n"), (2, "Sub", "more\ntext\n")]
+
+
+def test_chunk_text_bounds_and_overlap():
+    chunks = convert_userguide.chunk_text("a b c d e f g h", max_tokens=3, overlap_tokens=1)
+    assert chunks == ["a b c", "c d e", "e f g", "g h"]
+    assert convert_userguide.chunk_text("a b", max_tokens=3, overlap_tokens=1) == ["a b"]
+
+
+def test_convert_file_keeps_lineage_across_chunks(tmp_path):
+    path = tmp_path / "guide.md"
+    path.write_text("# Guide\n## Setup\none two three four five\n", encoding="utf-8")
+
+    rows = convert_userguide.convert_file(path, max_tokens=3, overlap_tokens=0)
+    setup_rows = [row for row in rows if row["section_id"] == "setup"]
+
+    assert [row["chunk_index"] for row in setup_rows] == [0, 1]
+    assert all(row["pageTrace"] == "Guide<_dot_>Guide<_dot_>Setup" for row in setup_rows)
+    assert setup_rows[1]["content"] == "four five"
@@ -0,0 +1,32 @@
+from langchain_core.documents import Document
+
+from app.documents.dedup import MinHasher, deduplicate_documents, estimated_jaccard
+
+BOILERPLATE = (
+    "For further assistance contact the support team through the help desk portal "
+    "and include your request id, the endpoint you called and the full error message."
+)
+
+
+def make_doc(content, section_id):
+    return Document(page_content=content, metadata={"section_id": section_id})
+
+
+def test_identical_text_has_identical_signature():
+    hasher = MinHasher(num_perm=32)
+    assert estimated_jaccard(hasher.signature(BOILERPLATE), hasher.signature(BOILERPLATE)) == 1.0
+
+
+def test_near_duplicates_collapse_onto_first_document():
+    documents = [
+        make_doc(BOILERPLATE, "support-a"),
+        make_doc("Vector search ranks sections by cosine distance between embeddings.", "search"),
+        make_doc(BOILERPLATE.replace("error message", "error text"), "support-b"),
+    ]
+    stats = {}
+
+    canonical = list(deduplicate_documents(documents, stats, threshold=0.7))
+
+    assert [doc.metadata["section_id"] for doc in canonical] == ["support-a", "search"]
+    assert canonical[0].metadata["duplicates"] == [{"section_id": "support-b"}]
+    assert stats == {"input": 3, "canonical": 2, "duplicates": 1}
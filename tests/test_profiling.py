@@ -0,0 +1,102 @@
+import asyncio
+import sys
+import threading
+
+from app import profiling
+from app.config import settings
+from app.profiling import SamplingProfiler, admin_token_valid, artifact_path, collapse_stack
+
+
+def test_collapse_stack_is_root_first():
+    def inner():
+        return collapse_stack(sys._getframe(), "worker")
+
+    stack = inner().split(";")
+    assert stack[0] == "worker"
+    assert stack[-1].startswith("inner (")
+    assert stack[-2].startswith("test_collapse_stack_is_root_first (")
+
+
+def test_sampler_records_other_threads():
+    release = threading.Event()
+    thread = threading.Thread(target=release.wait, name="blocked-worker")
+    thread.start()
+    try:
+        profiler = SamplingProfiler(seconds=1, interval_ms=1)
+        profiler.sample()
+        profiler.sample()
+    finally:
+        release.set()
+        thread.join()
+
+    assert profiler.samples == 2
+    lines = profiler.collapsed().splitlines()
+    blocked = [line for line in lines if line.startswith("blocked-worker;")]
+    assert blocked and blocked[0].endswith(" 2")
+
+
+def test_artifact_names_cannot_escape_profile_dir():
+    assert artifact_path("../app.log") is None
+    assert artifact_path("sub/dir.html") is None
+    assert artifact_path("request-abc-1.html").endswith("request-abc-1.html")
+
+
+def test_admin_token_required_and_configured(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert not admin_token_valid("")
+    assert not admin_token_valid("anything")
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    assert admin_token_valid("s3cret")
+    assert not admin_token_valid("wrong")
+    assert not admin_token_valid(None)
+    assert not admin_token_valid("s3crét")
+
+
+def run_middleware(headers):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        calls.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    asyncio.run(profiling.RequestProfilingMiddleware(app)(scope, None, send))
+    return calls
+
+
+def test_request_profiling_is_switched_at_runtime(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    headers = [(b"x-profile", b"1"), (b"x-admin-token", b"s3cret")]
+
+    profiling.set_request_profiling(False)
+    assert b"x-profile-artifact" not in dict(run_middleware(headers)[1]["headers"])
+
+    profiling.set_request_profiling(True)
+    try:
+        assert b"x-profile-artifact" in dict(run_middleware(headers)[1]["headers"])
+        # A token that is not UTF-8 is a mismatch: served unprofiled, not a 500
+        calls = run_middleware([(b"x-profile", b"1"), (b"x-admin-token", b"\xff\xfe")])
+        assert b"x-profile-artifact" not in dict(calls[1]["headers"])
+    finally:
+        profiling.set_request_profiling(False)
+
+
+def test_every_admin_endpoint_requires_the_token(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routers import admin
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    api = FastAPI()
+    api.include_router(admin.router)
+    client = TestClient(api)
+
+    for path in ("/admin/db/pool", "/admin/logging", "/admin/profile/requests", "/admin/profile/artifacts"):
+        assert client.get(path).status_code == 403
+    assert client.get("/admin/logging", headers={"X-Admin-Token": "s3cret"}).status_code == 200
@@ -0,0 +1,63 @@
+import json
+import math
+from collections import Counter
+
+import pytest
+
+from app.utils.build_expansion_table import cooccurrence_npmi
+from app.utils.query_expander import DEFAULT_TERM_EXPANSIONS, QueryExpander
+
+
+@pytest.fixture
+def expander(monkeypatch):
+    monkeypatch.setattr(QueryExpander, "_expansion_table", {
+        "webhook": [("callback", 0.9), ("event", 0.8)],
+        "retry": [("backoff", 0.2), ("event", 0.6)],
+    })
+    return QueryExpander()
+
+
+def test_expansion_gated_on_mean_confidence(expander):
+    assert expander.expand_with_synonyms("webhook", min_gain=0.5) == ["webhook", "webhook callback event"]
+    assert expander.expand_with_synonyms("retry", min_gain=0.5) == ["retry"]
+    assert expander.expand_with_synonyms("unknown", min_gain=0.0) == ["unknown"]
+
+
+def test_shared_neighbour_is_counted_once(expander):
+    expansions = expander.expand_with_scores("webhook retry")
+
+    assert expansions == [("callback", 0.9), ("event", 0.8), ("backoff", 0.2)]
+    # Mean of 0.9, 0.8 and 0.2 (0.633), not of a list with "event" twice (0.625)
+    assert expander.expand_with_synonyms("webhook retry", min_gain=0.63) == [
+        "webhook retry", "webhook retry callback event backoff"
+    ]
+
+
+def test_load_expansion_table_falls_back_to_defaults(monkeypatch, tmp_path):
+    monkeypatch.setattr(QueryExpander, "_expansion_table", None)
+    defaults = {term: [(n, 1.0) for n in neighbours] for term, neighbours in DEFAULT_TERM_EXPANSIONS.items()}
+
+    assert QueryExpander.load_expansion_table(str(tmp_path / "missing.json")) == defaults
+
+    malformed = tmp_path / "malformed.json"
+    malformed.write_text(json.dumps({"model": "x"}), encoding="utf-8")
+    assert QueryExpander.load_expansion_table(str(malformed)) == defaults
+
+    table = tmp_path / "table.json"
+    table.write_text(json.dumps({"terms": {"webhook": [["callback", 0.9]]}}), encoding="utf-8")
+    assert QueryExpander.load_expansion_table(str(table)) == {"webhook": [("callback", 0.9)]}
+
+
+def test_cooccurrence_npmi_on_tiny_corpus():
+    doc_tokens = [{"webhook", "retry"}, {"webhook", "retry"}, {"export", "csv"}, {"webhook"}]
+    vocab = ["webhook", "retry", "export", "csv"]
+    doc_freq = Counter(term for tokens in doc_tokens for term in tokens)
+
+    npmi = cooccurrence_npmi(doc_tokens, vocab, doc_freq)
+
+    # Always together: maximal association
+    assert npmi[("export", "csv")] == pytest.approx(1.0)
+    # p(ab)=0.5, p(a)=0.75, p(b)=0.5
+    assert npmi[("webhook", "retry")] == pytest.approx(math.log(0.5 / 0.375) / -math.log(0.5))
+    assert npmi[("retry", "webhook")] == npmi[("webhook", "retry")]
+    assert ("webhook", "export") not in npmi
@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+
+from app.config import settings
+from app.utils.query_router import LegLatencyTracker, QueryRouter
+
+
+def make_router(quality, latency_ms):
+    router = QueryRouter()
+    router.labels = ["tfidf", "vector"]
+    router.centroids = np.eye(2, dtype=np.float32)
+    router.quality = np.asarray(quality, dtype=np.float32)
+    router.latency = LegLatencyTracker(alpha=1.0)
+    router.latency.latency_ms = dict(latency_ms)
+    return router
+
+
+def test_router_prefers_cheaper_route_of_similar_quality():
+    # Query looks like the "tfidf" centroid, where tfidf and hybrid are equally good
+    router = make_router(
+        quality=[[0.9, 0.5, 0.9], [0.3, 0.9, 0.9]],
+        latency_ms={"tfidf": 5.0, "vector": 60.0},
+    )
+    assert router.route([1.0, 0.0]) == "tfidf"
+
+
+def test_router_pays_for_quality_when_cheaper_route_is_worse():
+    router = make_router(
+        quality=[[0.9, 0.5, 0.9], [0.3, 0.9, 0.93]],
+        latency_ms={"tfidf": 5.0, "vector": 60.0},
+    )
+    assert router.route([0.0, 1.0]) == "vector"
+
+
+def test_latency_tracker_moves_towards_observations():
+    tracker = LegLatencyTracker(alpha=0.5)
+    tracker.latency_ms = {"tfidf": 10.0, "vector": 100.0}
+    tracker.record("vector", 50.0)
+    assert tracker.latency_ms["vector"] == 75.0
+    assert tracker.route_latency("hybrid") == 85.0
+
+
+def write_centroids(tmp_path, data):
+    path = tmp_path / "centroids.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+
+def test_load_falls_back_when_centroids_are_malformed(tmp_path):
+    router = QueryRouter()
+    path = write_centroids(tmp_path, {"centroids": {"tfidf": [1.0] * settings.VECTOR_SIZE}})
+
+    assert router.load(path) is False
+    assert not router.is_calibrated
+
+
+def test_load_falls_back_when_embedding_size_differs(tmp_path):
+    router = QueryRouter()
+    path = write_centroids(tmp_path, {"centroids": {"tfidf": [1.0, 0.0]}, "quality": {"tfidf": {"tfidf": 0.9}}})
+
+    assert router.load(path) is False
+    assert not router.is_calibrated
+
+    path = write_centroids(tmp_path, {
+        "centroids": {"tfidf": [1.0] * settings.VECTOR_SIZE},
+        "quality": {"tfidf": {"tfidf": 0.9}},
+    })
+    assert router.load(path) is True
+    assert router.centroids.shape == (1, settings.VECTOR_SIZE)
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+from app.utils.reranker import CrossEncoderReranker
+
+
+class StubModel:
+    """Scores a pair by the number in its content; optionally slow"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.pairs = []
+
+    def predict(self, pairs):
+        time.sleep(self.delay)
+        self.pairs.extend(pairs)
+        return [float(content.split()[-1]) for _, content in pairs]
+
+
+def make_reranker(model, cache_size=100):
+    reranker = CrossEncoderReranker(model_name="stub", cache_size=cache_size)
+    reranker._model = model
+    return reranker
+
+
+def make_results(*scores):
+    return [{"id": f"doc-{i}", "content": f"candidate {score}"} for i, score in enumerate(scores)]
+
+
+def rerank(reranker, results, k, **kwargs):
+    return asyncio.run(reranker.rerank("query", results, k, **kwargs))
+
+
+def test_reranks_by_cross_encoder_score():
+    reranker = make_reranker(StubModel())
+    ranked = rerank(reranker, make_results(1, 3, 2), k=3, budget_ms=1000, batch_size=2)
+    assert [r["id"] for r in ranked] == ["doc-1", "doc-2", "doc-0"]
+    assert ranked[0]["rerank_score"] == 3.0
+
+
+def test_budget_cut_off_keeps_retrieval_order_for_unscored():
+    model = StubModel(delay=0.05)
+    reranker = make_reranker(model)
+    ranked = rerank(reranker, make_results(1, 4, 3, 2), k=4, budget_ms=20, batch_size=1)
+
+    # Only the first batch fits the budget; the rest follow in retrieval order, unscored
+    assert len(model.pairs) == 1
+    assert [r["id"] for r in ranked] == ["doc-0", "doc-1", "doc-2", "doc-3"]
+    assert "rerank_score" not in ranked[1]
+
+
+def test_cache_hits_are_free_and_keyed_on_document_id():
+    model = StubModel()
+    reranker = make_reranker(model)
+    rerank(reranker, make_results(1, 3), k=2, budget_ms=1000)
+    scored = len(model.pairs)
+
+    # Same ids, zero budget: cached scores still rank without calling the model
+    ranked = rerank(reranker, make_results(1, 3), k=2, budget_ms=0)
+    assert len(model.pairs) == scored
+    assert [r["id"] for r in ranked] == ["doc-1", "doc-0"]
+    assert "doc-1" in {key[1] for key in reranker._cache}
+
+
+def test_lru_eviction():
+    reranker = make_reranker(StubModel(), cache_size=2)
+    rerank(reranker, make_results(1, 2, 3), k=3, budget_ms=1000, batch_size=3)
+
+    assert len(reranker._cache) == 2
+    assert [key[1] for key in reranker._cache] == ["doc-1", "doc-2"]
+
+
+def test_model_is_loaded_off_the_event_loop(monkeypatch):
+    from app.utils import reranker as reranker_module
+
+    loaded_on = []
+
+    def load_model(*args, **kwargs):
+        loaded_on.append(threading.current_thread())
+        return StubModel()
+
+    monkeypatch.setattr(reranker_module, "CrossEncoder", load_model)
+    rerank(CrossEncoderReranker(model_name="stub"), make_results(1, 2), k=2, budget_ms=1000)
+
+    assert loaded_on and loaded_on[0] is not threading.main_thread()
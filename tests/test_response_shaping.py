@@ -0,0 +1,48 @@
+from app.utils.response_shaping import make_snippet, result_key, shape_results
+
+RESULTS = [
+    {
+        "id": "a1",
+        "content": "Intro text. " * 30 + "Configure the webhook secret in settings. " + "Trailing text. " * 30,
+        "metadata": {"section_id": "webhooks", "pageTrace": "Guide > Webhooks"},
+        "source": "vector",
+    },
+    {
+        "id": "b2",
+        "content": "Short answer.",
+        "metadata": {"section_id": "faq", "pageTrace": "Guide > FAQ"},
+        "source": "tfidf",
+    },
+]
+
+
+def test_ids_view_returns_only_ids():
+    assert shape_results(RESULTS, "webhook", view="ids") == ["a1", "b2"]
+
+
+def test_snippet_view_centres_on_query_term_without_mutating_results():
+    shaped = shape_results(RESULTS, "webhook secret", view="snippet", snippet_chars=80)
+
+    assert "content" not in shaped[0]
+    assert "webhook" in shaped[0]["snippet"]
+    assert len(shaped[0]["snippet"]) <= 80 + 6
+    assert shaped[1]["snippet"] == "Short answer."
+    assert "content" in RESULTS[0]
+
+
+def test_field_projection_selects_metadata_keys():
+    shaped = shape_results(RESULTS, "webhook", fields="id,metadata.section_id")
+    assert shaped == [
+        {"id": "a1", "metadata": {"section_id": "webhooks"}},
+        {"id": "b2", "metadata": {"section_id": "faq"}},
+    ]
+
+
+def test_result_key_falls_back_to_content():
+    assert result_key({"id": None, "content": "text"}) == "text"
+    assert result_key(RESULTS[1]) == "b2"
+
+
+def test_make_snippet_without_match_starts_at_beginning():
+    snippet = make_snippet("x" * 500, "nothing", width=50)
+    assert snippet.startswith("x") and snippet.endswith("...")
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+from app.routers import query
+from app.utils.admission import AdmissionController
+
+
+class StubRequest:
+    async def is_disconnected(self):
+        return False
+
+
+class StubPreprocessor:
+    def preprocess(self, text):
+        return text
+
+
+def hits(source, *ids):
+    return [{"id": doc_id, "content": f"{source} {doc_id}", "metadata": {}} for doc_id in ids]
+
+
+@pytest.fixture(autouse=True)
+def stub_search(monkeypatch):
+    monkeypatch.setattr(query, "QueryPreprocessor", StubPreprocessor)
+    monkeypatch.setattr(AdmissionController, "_instances", {})
+
+
+def stream_events(monkeypatch, tfidf, vector):
+    monkeypatch.setattr(query, "_tfidf_search", tfidf)
+    monkeypatch.setattr(query, "_vector_search", vector)
+
+    async def collect():
+        response = await query.stream_search(StubRequest(), "webhook retries", k=3, stream_format="ndjson")
+        return [json.loads(line) async for line in response.body_iterator]
+
+    return asyncio.run(collect())
+
+
+def test_events_arrive_in_completion_order_then_fused(monkeypatch):
+    async def tfidf(q, k):
+        await asyncio.sleep(0.05)
+        return hits("tfidf", "a", "b")
+
+    async def vector(q, k, collection_id=None):
+        return hits("vector", "b", "c")
+
+    events = stream_events(monkeypatch, tfidf, vector)
+
+    assert [event["event"] for event in events] == ["vector", "tfidf", "fused"]
+    assert [r["source"] for r in events[0]["results"]] == ["vector", "vector"]
+    assert {r["id"] for r in events[2]["results"]} == {"a", "b", "c"}
+
+
+def test_leg_failure_ends_stream_with_error_event(monkeypatch):
+    async def tfidf(q, k):
+        return hits("tfidf", "a")
+
+    async def vector(q, k, collection_id=None):
+        await asyncio.sleep(0.05)
+        raise ConnectionResetError("connection was closed in the middle of operation")
+
+    events = stream_events(monkeypatch, tfidf, vector)
+
+    assert [event["event"] for event in events] == ["tfidf", "error"]
+    assert events[1]["status"] == 500
@@ -0,0 +1,94 @@
+import csv
+
+from app.config import settings
+from app.documents.csv_parser import CSVParser
+from app.documents.tfidf_processor import PersistentTFIDFProcessor
+from app.routers.query import _merge_results, _rrf_merge
+from app.utils import convert_userguide
+
+ROWS = [
+    {"section_id": "webhooks", "content": "Webhooks notify your server when an order ships."},
+    {"section_id": "api-keys", "content": "API keys authenticate requests to the public API."},
+    {"section_id": "exports", "content": "Reports can be exported to CSV from the dashboard."},
+]
+
+
+def write_csv(path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["headingTrace", "pageTrace", "page_id", "section_id", "content"])
+        writer.writeheader()
+        for row in ROWS:
+            writer.writerow({
+                "headingTrace": row["section_id"],
+                "pageTrace": f"Guide > {row['section_id']}",
+                "page_id": "guide",
+                "section_id": row["section_id"],
+                "content": row["content"],
+            })
+
+
+def build_processor(tmp_path):
+    csv_path = tmp_path / "userguide.csv"
+    write_csv(csv_path)
+    processor = PersistentTFIDFProcessor()
+    processor.tfidf_path = str(tmp_path / "tfidf.pkl")
+    processor.initialize(csv_path=str(csv_path), force_rebuild=True)
+    return processor
+
+
+def test_tfidf_results_carry_document_ids(tmp_path):
+    processor = build_processor(tmp_path)
+
+    results = processor.search("webhooks order ships", k=3)
+
+    assert results[0].metadata["section_id"] == "webhooks"
+    for doc in results:
+        assert doc.id == CSVParser._document_id(doc.metadata, doc.page_content)
+
+
+def test_ids_survive_the_cache(tmp_path):
+    build_processor(tmp_path)
+    processor = PersistentTFIDFProcessor()
+    processor.tfidf_path = str(tmp_path / "tfidf.pkl")
+    processor.initialize(csv_path=str(tmp_path / "userguide.csv"))
+
+    assert all(doc.id for doc in processor.search("api keys", k=3))
+
+
+def test_document_found_by_both_legs_is_merged(tmp_path):
+    processor = build_processor(tmp_path)
+    doc = processor.search("webhooks order ships", k=1)[0]
+    tfidf_hit = {"id": doc.id, "content": doc.page_content, "metadata": doc.metadata, "source": "tfidf"}
+    # The vector leg returns the same row from the vector table, with the same id
+    vector_hit = {"id": doc.id, "content": doc.page_content, "metadata": dict(doc.metadata), "source": "vector"}
+    other_hit = {"id": "other", "content": "Something else.", "metadata": {}, "source": "vector"}
+
+    assert [r["id"] for r in _merge_results([tfidf_hit], [vector_hit, other_hit], 5)] == [doc.id, "other"]
+    assert [r["id"] for r in _rrf_merge([tfidf_hit], [other_hit, vector_hit], 5)] == [doc.id, "other"]
+
+
+class WordTokenizer:
+    """One token per word, so no model download is needed"""
+
+    def __call__(self, words, add_special_tokens=False):
+        return {"input_ids": [[0] for _ in words]}
+
+
+def test_index_is_built_from_markdown_sources_and_rebuilt_when_they_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(convert_userguide, "_tokenizer", WordTokenizer())
+    guide = tmp_path / "docs" / "guide.md"
+    guide.parent.mkdir()
+    guide.write_text("# Guide\n## Webhooks\nWebhooks notify your server when an order ships.\n", encoding="utf-8")
+    monkeypatch.setattr(settings, "USERGUIDE_SOURCES", str(guide.parent))
+
+    processor = PersistentTFIDFProcessor()
+    processor.tfidf_path = str(tmp_path / "tfidf.pkl")
+    processor.initialize()
+    assert processor.search("webhooks order ships", k=1)[0].metadata["section_id"] == "webhooks"
+
+    with open(guide, "a", encoding="utf-8") as f:
+        f.write("## API Keys\nAPI keys authenticate requests to the public API.\n")
+    processor = PersistentTFIDFProcessor()
+    processor.tfidf_path = str(tmp_path / "tfidf.pkl")
+    processor.initialize()
+    assert processor.search("api keys authenticate", k=1)[0].metadata["section_id"] == "api-keys"
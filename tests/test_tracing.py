@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import os
+import queue
+import subprocess
+import sys
+
+from app import tracing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_log_queue_status_counts_dropped_records(monkeypatch):
+    handler = tracing.DroppingQueueHandler(queue.Queue(maxsize=1))
+    monkeypatch.setattr(tracing, "_queue_handler", handler)
+    record = logging.makeLogRecord({"msg": "hello"})
+
+    handler.enqueue(record)
+    handler.enqueue(record)
+    handler.enqueue(record)
+
+    assert tracing.log_queue_status() == {"queued": 1, "capacity": 1, "dropped": 2}
+
+
+def test_records_logged_just_before_exit_are_written(tmp_path):
+    log_file = tmp_path / "app.log"
+    script = (
+        "import logging, sys\n"
+        "from app.tracing import configure_logging\n"
+        f"configure_logging(log_file={str(log_file)!r}, json_format=False)\n"
+        "logging.getLogger('app.main').critical('Could not start PostgreSQL server. Exiting...')\n"
+        "sys.exit(1)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True)
+
+    assert result.returncode == 1
+    assert "Could not start PostgreSQL server" in log_file.read_text()
+
+
+def test_request_id_header_is_kept_only_if_plain():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(tracing.request_id_var.get())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        seen.append(dict(message["headers"])[b"x-request-id"])
+
+    middleware = tracing.RequestTracingMiddleware(app)
+    for value in (b"abc-123", b"\xff\xfe", b"x" * 200):
+        seen.clear()
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"x-request-id", value)]}
+        asyncio.run(middleware(scope, None, send))
+        assert seen[1] == seen[0].encode()
+        assert (seen[0] == "abc-123") == (value == b"abc-123")
+        assert len(seen[0]) <= 64
@@ -0,0 +1,63 @@
+from app.warmup import WarmupStatus, is_steady
+
+
+def test_needs_two_rounds_before_steady():
+    assert not is_steady([], 0.2)
+    assert not is_steady([120.0], 0.2)
+
+
+def test_steady_when_consecutive_rounds_agree():
+    assert not is_steady([400.0, 150.0], 0.2)
+    assert is_steady([400.0, 150.0, 140.0], 0.2)
+    assert is_steady([100.0, 120.0], 0.2)
+
+
+def test_status_reports_rounds():
+    status = WarmupStatus()
+    status.round_means_ms.extend([412.34, 151.06])
+    assert status.as_dict() == {
+        "ready": False,
+        "attempts": 0,
+        "rounds": 2,
+        "round_means_ms": [412.3, 151.1],
+        "error": None,
+    }
+    status.mark_ready()
+    assert status.as_dict()["ready"]
+
+
+def test_failed_warmup_keeps_replica_unready_until_retry_succeeds(monkeypatch):
+    import asyncio
+
+    from app import warmup
+    from app.config import settings
+
+    status = WarmupStatus()
+    monkeypatch.setattr(WarmupStatus, "_instance", status)
+    monkeypatch.setattr(settings, "WARMUP_PREWARM", False)
+    monkeypatch.setattr(settings, "WARMUP_RETRY_SECONDS", 0)
+    monkeypatch.setattr(settings, "WARMUP_QUERIES", ["q"])
+    monkeypatch.setattr(settings, "WARMUP_MAX_ROUNDS", 3)
+    monkeypatch.setattr(settings, "WARMUP_STEADY_TOLERANCE", 0.2)
+
+    seen = []
+
+    async def prime_models():
+        seen.append(status.as_dict())
+        if len(seen) == 1:
+            raise ConnectionError("database unreachable")
+
+    async def run_round(queries):
+        return 100.0
+
+    monkeypatch.setattr(warmup, "prime_models", prime_models)
+    monkeypatch.setattr(warmup, "run_round", run_round)
+
+    asyncio.run(warmup.run_warmup())
+
+    # The retry started while still unready, with the failure reported
+    assert seen[1]["ready"] is False
+    assert seen[1]["error"] == "database unreachable"
+    assert status.ready and status.error is None
+    assert status.attempts == 2
+    assert status.round_means_ms == [100.0, 100.0]